@@ -0,0 +1,2 @@
+# the programs in test_inputs are inputs of test_flatliner.py, not tests
+collect_ignore = ['test_inputs']
@@ -1,37 +1,265 @@
 import ast
+import copy
 
-def construct_lambda(vals: dict[str, str], body: str = '{}') -> str:
+def stored_names(node) -> set:
     """
-    Returns a lambda function string with the arguments provided.
-    >>> construct_lambda({'a': '1', 'b': '2'})
-    '(lambda a, b: {})(1, 2)'
-    >>> exec(construct_lambda({'a': '1', 'b': '2'}, 'print(a + b)'))
-    3
+    Returns the names assigned within a node.
+    >>> sorted(stored_names(ast.parse('a, (b, c[d]) = e').body[0]))
+    ['a', 'b']
     """
-    return f'(lambda {", ".join(vals.keys())}: {body})({", ".join(vals.values())})'
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
 
 
-def provide_y(body: str) -> str:
+def loaded_names(node) -> set:
     """
-    provides the Y combinator.
+    Returns the names read within a node.
+    >>> sorted(loaded_names(ast.parse('a, (b, c[d]) = e').body[0]))
+    ['c', 'd', 'e']
     """
-    return construct_lambda({'_Y': '(lambda f: (lambda x: x(x))(lambda y: f(lambda *args: y(y)(*args))))'}, body)
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
 
 
-def wrap_globals(body: str):
+class LoopAnalysis:
     """
-    Wraps a lambda body with the globals dict.
-    >>> wrap_globals('print(a)')
-    '(lambda __g: print(a))(globals())'
+    Annotates the loops of a module with the variables bound before them and the variables whose value is
+    read after entering them, such that the Flatliner only checks at runtime whether a loop variable is bound
+    if that depends on the path to the loop.
+
+    Each statement is flattened into a lambda enclosing the flattened rest of its block, so a variable is
+    bound at a loop if an assignment to it precedes the loop on every path, and the variables of a loop are
+    bound throughout and after it, as parameters of the loop lambda. node.bound maps the variables bound on
+    some path to the loop to whether they are bound on every path, and node.live holds the variables read
+    before being assigned from the loop on.
+
+    A first traversal annotates each loop with node.assigned, the variables the Flatliner threads through its
+    iterations, and node.exits, its break and continue statements, such that the Flatliner does not walk the
+    loop again, nor an enclosing loop its inner loops.
+
+    The rest of the block after an if statement would be flattened into both of its branches, so if statements
+    followed by other statements are annotated with a join point instead: node.join holds the variables that
+    the branches may assign and the rest of the block reads, which the Flatliner passes to a lambda holding the
+    rest of the block, and node.ends the variables bound at the end of either branch, as returned by bound.
     """
-    return construct_lambda({'__g': 'globals()'}, body)
+
+    def __init__(self, flatliner: 'Flatliner'):
+        self.flatliner = flatliner
+        self.names = {}
+
+    def annotate(self, body: list):
+        self.collect(body, None)
+        self.bound(body, {})
+        self.live(body, set())
+
+    def collect(self, nodes: list, loop) -> set:
+        """
+        Annotates the loops among and within the nodes, the innermost enclosing loop being loop, and returns the
+        variables assigned within the nodes, those of the targets of for loops excluded.
+        """
+        assigned = set()
+        for node in nodes:
+            if isinstance(node, (ast.While, ast.For)):
+                node.exits = []
+                node.assigned = self.collect(node.body, node)
+                orelse = self.collect(node.orelse, loop)
+                assigned |= node.assigned | orelse
+                if isinstance(node, ast.While):
+                    node.assigned |= orelse
+                else:
+                    target = ast.Assign([node.target], ast.Constant(None))
+                    node.assigned |= self.flatliner.assigned_variables(target)
+            elif isinstance(node, (ast.Break, ast.Continue)):
+                if loop is not None:
+                    loop.exits.append(node)
+            elif not isinstance(node, ast.expr):
+                assigned |= self.flatliner.assigned_variables(node)
+                assigned |= self.collect(list(ast.iter_child_nodes(node)), loop)
+        return assigned
+
+    def loaded(self, node) -> set:
+        if (node, 'loaded') not in self.names:
+            self.names[node, 'loaded'] = loaded_names(node)
+        return self.names[node, 'loaded']
+
+    def stored(self, node) -> set:
+        if (node, 'stored') not in self.names:
+            self.names[node, 'stored'] = stored_names(node)
+        return self.names[node, 'stored']
+
+    def written(self, body: list) -> set:
+        """
+        Returns the variables the statements of a block may bind, those bound in function definitions excluded.
+        """
+        written = set()
+        for node in body:
+            if (node, 'written') not in self.names:
+                if isinstance(node, (ast.Import, ast.ImportFrom)):
+                    names = {a.asname if a.asname else a.name.split('.')[0] for a in node.names}
+                elif isinstance(node, ast.ClassDef):
+                    names = {node.name}
+                elif isinstance(node, ast.FunctionDef):
+                    names = set()
+                else:
+                    children = list(ast.iter_child_nodes(node))
+                    names = self.written([c for c in children if isinstance(c, (ast.stmt, ast.excepthandler))])
+                    names |= set().union(*[self.stored(c) for c in children if isinstance(c, ast.expr)])
+                self.names[node, 'written'] = names
+            written |= self.names[node, 'written']
+        return written
+
+    def bound(self, body: list, state: dict):
+        """
+        Returns the variables bound after a block, mapped to whether they are bound on every path, or None if
+        the block does not continue.
+        """
+        for node in body:
+            if state is None:
+                return None
+            if isinstance(node, (ast.While, ast.For)):
+                node.bound = dict(state)
+                inner = {**state, **dict.fromkeys(node.assigned, True)}
+                self.bound(node.body, inner)
+                state = inner
+            elif isinstance(node, ast.If):
+                node.ends = self.bound(node.body, state), self.bound(node.orelse, state)
+                state = self.merge(*node.ends)
+            elif isinstance(node, (ast.Assign, ast.AugAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                state = {**state, **dict.fromkeys(set().union(*map(self.stored, targets)), True)}
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                names = [a.asname if a.asname else a.name.split('.')[0] for a in node.names]
+                state = {**state, **dict.fromkeys(names, True)}
+            elif isinstance(node, ast.FunctionDef):
+                args = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+                args += [a for a in (node.args.vararg, node.args.kwarg) if a is not None]
+                self.bound(node.body, {**state, **dict.fromkeys([a.arg for a in args], True)})
+            elif isinstance(node, ast.ClassDef):
+                state = {**state, node.name: True}
+            elif isinstance(node, (ast.Return, ast.Raise, ast.Break, ast.Continue)):
+                state = None
+            elif not isinstance(node, (ast.Expr, ast.Assert, ast.Pass)):
+                state = {**dict.fromkeys(self.stored(node), False), **state}
+        return state
+
+    @staticmethod
+    def merge(first: dict, second: dict):
+        if first is None or second is None:
+            return second if first is None else first
+        return {v: first.get(v, False) and second.get(v, False) for v in first.keys() | second.keys()}
+
+    def live(self, body: list, live: set, loop: tuple = (set(), set())) -> set:
+        """
+        Returns the variables read before being assigned from the start of a block on, given those after the
+        block and those after and at the start of the enclosing loop.
+        """
+        rest = False
+        for node in body[::-1]:
+            if isinstance(node, (ast.While, ast.For)):
+                # the sets grow as the enclosing loops iterate, so a loop reached again starts from its last sets
+                after, node.live = live, node.live if hasattr(node, 'live') else set()
+                while True:
+                    head = after | self.live(node.body, node.live, (after, node.live))
+                    head |= self.loaded(node.test) if isinstance(node, ast.While) else set()
+                    if isinstance(node, ast.For):
+                        head = (head - self.stored(node.target)) | self.loaded(node.target) | after
+                    if head == node.live:
+                        break
+                    node.live = head
+                live = head | (self.loaded(node.iter) if isinstance(node, ast.For) else set())
+            elif isinstance(node, ast.If):
+                if rest and hasattr(node, 'ends'):
+                    node.join = sorted(live & (self.written(node.body) | self.written(node.orelse)))
+                live = self.loaded(node.test) | self.live(node.body, live, loop) | self.live(node.orelse, live, loop)
+            elif isinstance(node, ast.Assign):
+                live = (live - set().union(*map(self.stored, node.targets))) | self.loaded(node)
+            elif isinstance(node, (ast.Return, ast.Raise)):
+                live = self.loaded(node)
+            elif isinstance(node, ast.Break):
+                live = loop[0]
+            elif isinstance(node, ast.Continue):
+                live = loop[1]
+            elif isinstance(node, ast.FunctionDef):
+                self.live(node.body, set())
+                live = live | self.loaded(node)
+            elif isinstance(node, ast.AugAssign):
+                live = live | self.loaded(node) | self.stored(node.target)
+            else:
+                live = live | self.loaded(node)
+            rest = rest or not (isinstance(node, ast.Pass) or isinstance(node, ast.Expr)
+                                and not isinstance(node.value, ast.Call))
+        return live
+
+
+LOAD, STORE = ast.Load(), ast.Store()
+
+
+def name(id: str) -> ast.Name:
+    return ast.Name(id, LOAD)
+
+
+def call(func: ast.expr, args: list) -> ast.Call:
+    return ast.Call(func, args, [])
+
+
+def params(names: list) -> list:
+    """
+    Returns the parameters of a lambda taking the names, which may list several comma-separated names.
+    >>> params(['a', 'b, c'])
+    ['a', 'b', 'c']
+    """
+    return [p.strip() for n in names for p in n.split(',')]
+
+
+def make_lambda(names: list, body: ast.expr, defaults: list = ()) -> ast.Lambda:
+    args = ast.arguments(posonlyargs=[], args=[ast.arg(p) for p in params(names)], vararg=None, kwonlyargs=[],
+                         kw_defaults=[], kwarg=None, defaults=list(defaults))
+    return ast.Lambda(args, body)
+
+
+def let(vals: dict, body: ast.expr) -> ast.Call:
+    """
+    Returns the AST of a lambda over vals applied to their values, the values being ASTs or lists of argument ASTs.
+    >>> ast.unparse(let({'a': ast.Constant(1), 'b': name('c')}, name('a')))
+    '(lambda a, b: a)(1, c)'
+    """
+    args = [a for v in vals.values() for a in (v if isinstance(v, list) else [v])]
+    return call(make_lambda(list(vals), body), args)
+
+
+def store(target: ast.expr) -> ast.expr:
+    """
+    Returns an assignment target from an expression.
+    """
+    target = copy.copy(target)
+    target.ctx = STORE
+    if isinstance(target, (ast.Tuple, ast.List)):
+        target.elts = [store(elt) for elt in target.elts]
+    elif isinstance(target, ast.Starred):
+        target.value = store(target.value)
+    return target
+
+
+Y_COMBINATOR = '(lambda f: (lambda x: x(x))(lambda y: f(lambda *args: y(y)(*args))))'
 
 
 class Flatliner:
-    def __init__(self):
+    """
+    Flattens a module into a single expression. The handlers build the AST of the flattened expression, each
+    statement becoming a lambda or comprehension enclosing the AST of its continuation, the flattened rest of its
+    block, and unparse returns its source.
+    """
+
+    def __init__(self, loops: str = 'y'):
+        """
+        loops: how loops are lowered, 'y' into recursion with the Y combinator, or 'fold' into calls to the
+        loop_fold function of the transformed functions, which run the iterations without recursing
+        """
+        if loops not in ('y', 'fold'):
+            raise ValueError(f'unknown loop lowering {loops}')
+        self.loops = loops
         self.ast = None
         self.needs_y = False
         self.loop_no = 1
+        self.join_no = 1
         self.node_handlers = {
             ast.Assign: self.handle_assign,
             ast.AugAssign: self.handle_augassign,
@@ -79,278 +307,335 @@ class Flatliner:
     def apply_handler(self, node, cont=None):
         return self.node_handlers.get(type(node), self.handle_error)(node, cont)
 
-    def handle_constant(self, node, cont) -> str:
-        return repr(node.value)
+    @staticmethod
+    def continuation(cont) -> ast.expr:
+        """
+        Returns the AST of a continuation, the None continuation of the last statement being the None constant.
+        """
+        return ast.Constant(None) if cont is None else cont
 
-    def handle_name(self, node, cont) -> str:
-        return node.id
+    def handle_constant(self, node, cont):
+        return ast.Constant(node.value)
 
-    def handle_pass(self, node, cont) -> str:
+    def handle_name(self, node, cont):
+        return name(node.id)
+
+    def handle_pass(self, node, cont):
         return cont
 
-    def handle_loop_flow(self, node, cont) -> str:
+    def handle_loop_flow(self, node, cont):
         return node.contents
 
-    def handle_raise(self, node, cont) -> str:
-        return f'(_ for _ in []).throw({self.apply_handler(node.exc)})'
-
-    def handle_assert(self, node, cont) -> str:
-        message = '' if node.msg is None else f'({self.apply_handler(node.msg)})'
-        error = ast.parse(f'raise AssertionError{message}').body[0]
-        return f'({cont} if {self.apply_handler(node.test)} else {self.apply_handler(error)})'
-
-    def _next_item(self) -> str:
-        return f'next(_items{self.loop_no}, _term{self.loop_no})'
-
-    def handle_while(self, node, cont) -> str:
-        self.needs_y = True
-        assigned_in_loop = {self.apply_handler(n.targets[0]) for n in ast.walk(node) if isinstance(n, ast.Assign)
-                            and not isinstance(n.targets[0], (ast.Attribute, ast.Subscript, ast.Tuple))
-                            and len(n.targets) == 1}
-        assigned_in_loop |= {self.apply_handler(n.target) for n in ast.walk(node) if isinstance(n, ast.AugAssign)
-                             and not isinstance(n.target, (ast.Attribute, ast.Subscript))}
-        assigned_in_loop |= {self.apply_handler(child) for n in ast.walk(node) if isinstance(n, ast.Assign)
-                             and isinstance(n.targets[0], ast.Tuple) for child in n.targets[0].elts if
-                             not any(isinstance(n2, (ast.Attribute, ast.Subscript)) for n2 in ast.walk(child))}
-        assigned_in_loop = sorted(assigned_in_loop)
-        args = ', '.join(assigned_in_loop)
+    def handle_raise(self, node, cont):
+        thrower = ast.GeneratorExp(name('_'), [ast.comprehension(ast.Name('_', STORE), ast.List([], LOAD),
+                                                                 [], 0)])
+        return call(ast.Attribute(thrower, 'throw', LOAD), [self.apply_handler(node.exc)])
+
+    def handle_assert(self, node, cont):
+        exc = name('AssertionError') if node.msg is None else call(name('AssertionError'), [node.msg])
+        return ast.IfExp(self.apply_handler(node.test), self.continuation(cont),
+                         self.apply_handler(ast.Raise(exc, None)))
+
+    def _next_item(self):
+        return call(name('next'), [name(f'_items{self.loop_no}'), name(f'_term{self.loop_no}')])
+
+    def target_name(self, node) -> str:
+        if isinstance(node, ast.Name):
+            return node.id
+        return ast.unparse(self.apply_handler(node))
+
+    def assigned_variables(self, node) -> set:
+        """
+        Returns the variables an assignment statement adds to the variables of the loops around it.
+        """
+        if isinstance(node, ast.AugAssign) and not isinstance(node.target, (ast.Attribute, ast.Subscript)):
+            return {self.target_name(node.target)}
+        if not isinstance(node, ast.Assign):
+            return set()
+        if isinstance(node.targets[0], ast.Tuple):
+            return {self.target_name(child) for child in node.targets[0].elts
+                    if not any(isinstance(n, (ast.Attribute, ast.Subscript)) for n in ast.walk(child))}
+        if len(node.targets) == 1 and not isinstance(node.targets[0], (ast.Attribute, ast.Subscript)):
+            return {self.target_name(node.targets[0])}
+        return set()
+
+    def loop_variables(self, node) -> list:
+        """
+        Returns the variables assigned within a loop, which are threaded through its iterations, as annotated by
+        the LoopAnalysis, or found by walking the loop if it was not annotated.
+        """
+        if hasattr(node, 'assigned'):
+            return sorted(node.assigned)
+        return sorted(set().union(*map(self.assigned_variables, ast.walk(node))))
+
+    def loop_exits(self, node) -> list:
+        """
+        Returns the break and continue statements of a loop, as annotated by the LoopAnalysis, or those within
+        the loop if it was not annotated, the ones of inner loops being overwritten when these are flattened.
+        """
+        if hasattr(node, 'exits'):
+            return node.exits
+        return [n for n in ast.walk(node) if isinstance(n, (ast.Break, ast.Continue))]
+
+    @staticmethod
+    def value(var: str, bound: bool):
+        """
+        Returns the value a variable is passed with: the variable itself if it is bound, None if it is not, and
+        a runtime check of whether it is bound if that is unknown, bound being None.
+        """
+        if not var.isidentifier():
+            value = var if bound else 'None' if bound is False else f'{var} if "{var}" in dir() else None'
+            return ast.parse(f'f({value})', mode='eval').body.args
+        if bound is None:
+            probe = ast.Compare(ast.Constant(var), [ast.In()], [call(name('dir'), [])])
+            return ast.IfExp(probe, name(var), ast.Constant(None))
+        return name(var) if bound else ast.Constant(None)
+
+    def initial_value(self, node, var: str):
+        """
+        Returns the value a loop variable enters the loop with: the variable itself if it is bound on every
+        path to the loop, None if it is bound on no path or its value is never read, and a runtime check of
+        whether it is bound otherwise, or if the loop was not annotated by the LoopAnalysis.
+        """
+        bound = getattr(node, 'bound', None)
+        if bound is None or not var.isidentifier():
+            return self.value(var, None)
+        if var not in bound or var not in node.live:
+            return self.value(var, False)
+        return self.value(var, True if bound[var] else None)
+
+    def join_value(self, state: dict, var: str):
+        """
+        Returns the value a variable is passed to a join point with, given the variables bound at the end of the
+        branch calling it, like the initial value of a loop variable.
+        """
+        if state is None or var not in state:
+            return self.value(var, False)
+        return self.value(var, True if state[var] else None)
+
+    def handle_while(self, node, cont):
+        if self.loops == 'y':
+            self.needs_y = True
+        assigned_in_loop = self.loop_variables(node)
         loop_test = self.apply_handler(node.test)
         loop_id = f'_loop{self.loop_no}'
-        loop_call = f'{loop_id}({args})'
-        for n in ast.walk(node):
+        loop_call = call(name(loop_id), [name(p) for p in params(assigned_in_loop)])
+        join = None
+        if cont is not None and any(isinstance(n, ast.Break) for n in self.loop_exits(node)):
+            join = {f'_join{self.join_no}': make_lambda(assigned_in_loop, cont)}
+            cont = call(name(f'_join{self.join_no}'), [name(p) for p in params(assigned_in_loop)])
+            self.join_no += 1
+        cont = self.continuation(cont)
+        for n in self.loop_exits(node):
             if isinstance(n, ast.Break):
                 n.contents = cont
             if isinstance(n, ast.Continue):
                 if hasattr(node, 'target'):
-                    n.contents = construct_lambda({node.target: self._next_item()}, loop_call)
+                    n.contents = let({node.target: self._next_item()}, loop_call)
                 else:
                     n.contents = loop_call
         self.loop_no += 1
         loop_body = self.apply_handler(node.body, loop_call)
-        loop_repr = construct_lambda(
-            {loop_id: f'_Y(lambda {loop_id}: (lambda {args}: ({loop_body}) if {loop_test} else {cont}))'}, loop_call)
-        return construct_lambda({v: f'{v} if "{v}" in dir() else None' for v in assigned_in_loop}, loop_repr)
-
-    def handle_for(self, node, cont) -> str:
+        loop_lambda = make_lambda([loop_id], make_lambda(assigned_in_loop, ast.IfExp(loop_test, loop_body, cont)))
+        if self.loops == 'fold':
+            loop_repr = let({loop_id: call(name('loop_fold'), [ast.Constant(len(assigned_in_loop)), loop_lambda])},
+                            loop_call)
+        else:
+            loop_repr = let({loop_id: call(name('_Y'), [loop_lambda])}, loop_call)
+        loop_repr = let({v: self.initial_value(node, v) for v in assigned_in_loop}, loop_repr)
+        return loop_repr if join is None else let(join, loop_repr)
+
+    def handle_for(self, node, cont):
         target_id = f'_targ{self.loop_no}'
         iter_id = f'_items{self.loop_no}'
         term_id = f'_term{self.loop_no}'
-        pre = ast.parse(f'{self.apply_handler(node.target)} = {target_id}').body
-        post = ast.parse(f'{target_id} = {self._next_item()}').body
-        body_list = pre + node.body + post
-        while_test = ast.parse(f'{target_id} is not {term_id}').body[0]
-        while_equivalent = ast.While(while_test, body_list)
+        pre = [ast.Assign([store(node.target)], name(target_id))]
+        post = [ast.Assign([ast.Name(target_id, STORE)], self._next_item())]
+        while_test = ast.Compare(name(target_id), [ast.IsNot()], [name(term_id)])
+        while_equivalent = ast.While(while_test, pre + node.body + post, [])
         while_equivalent.target = target_id
-        return construct_lambda({term_id: '[]', iter_id: f'iter({self.apply_handler(node.iter)})'},
-                                construct_lambda({target_id: self._next_item()},
-                                                 self.apply_handler(while_equivalent, cont)))
+        if hasattr(node, 'bound'):
+            while_equivalent.bound = {**node.bound, target_id: True}
+            while_equivalent.live = node.live | {target_id}
+            while_equivalent.assigned = node.assigned | {target_id}
+            while_equivalent.exits = node.exits
+        items = call(name('iter'), [self.apply_handler(node.iter)])
+        return let({term_id: ast.List([], LOAD), iter_id: items},
+                   let({target_id: self._next_item()}, self.apply_handler(while_equivalent, cont)))
 
-    def _handle_container(self, node) -> str:
-        return ', '.join(self.apply_handler(child) for child in node.elts)
+    def handle_list(self, node, cont):
+        return ast.List([self.apply_handler(child) for child in node.elts], LOAD)
 
-    def handle_list(self, node, cont) -> str:
-        return f'[{self._handle_container(node)}]'
+    def handle_tuple(self, node, cont):
+        return ast.Tuple([self.apply_handler(child) for child in node.elts], LOAD)
 
-    def handle_tuple(self, node, cont) -> str:
-        return f'({self._handle_container(node)}{"," * (len(node.elts) == 1)})'
+    def handle_set(self, node, cont):
+        if not node.elts:
+            return ast.Dict([], [])
+        return ast.Set([self.apply_handler(child) for child in node.elts])
 
-    def handle_set(self, node, cont) -> str:
-        return '{' + self._handle_container(node) + '}'
+    def handle_dict(self, node, cont):
+        return ast.Dict([self.apply_handler(k) for k in node.keys], [self.apply_handler(v) for v in node.values])
 
-    def handle_dict(self, node, cont) -> str:
-        return '{' + ', '.join(f'{k}: {v}' for k, v in zip(map(self.apply_handler, node.keys),
-                                                           map(self.apply_handler, node.values))) + '}'
+    def handle_slice(self, node, cont):
+        return ast.Slice(*[self.apply_handler(n) if n is not None else None for n in [node.lower, node.upper, node.step]])
 
-    def handle_slice(self, node, cont) -> str:
-        parts = [self.apply_handler(n) if n is not None else '' for n in [node.lower, node.upper, node.step]]
-        return ':'.join(parts)
+    def handle_subscript(self, node, cont):
+        return ast.Subscript(self.apply_handler(node.value), self.apply_handler(node.slice), LOAD)
 
-    def handle_subscript(self, node, cont) -> str:
-        print('activated')
-        if isinstance(node.slice, ast.Tuple):
-            return f'{self.apply_handler(node.value)}[{self.apply_handler(node.slice)[1:-1]}]'
-        return f'{self.apply_handler(node.value)}[{self.apply_handler(node.slice)}]'
+    def handle_attribute(self, node, cont):
+        return ast.Attribute(self.apply_handler(node.value), node.attr, LOAD)
 
-    def handle_attribute(self, node, cont) -> str:
-        return f'{self.apply_handler(node.value)}.{node.attr}'
+    def first_of(self, target, values, cont):
+        """
+        Returns the AST of [cont for target in values][0].
+        """
+        comprehension = ast.comprehension(target, values, [], 0)
+        return ast.Subscript(ast.ListComp(cont, [comprehension]), ast.Constant(0), LOAD)
 
-    def handle_assign(self, node, cont) -> str:
+    def handle_assign(self, node, cont):
+        value = self.apply_handler(node.value)
         if len(node.targets) > 1:
-            targets = [self.apply_handler(t) for t in node.targets]
-            return f'[{cont} for {", ".join(targets)} in [[{self.apply_handler(node.value)}] * {len(targets)}]][0]'
+            targets = ast.Tuple([store(self.apply_handler(t)) for t in node.targets], STORE)
+            values = ast.BinOp(ast.List([value], LOAD), ast.Mult(), ast.Constant(len(node.targets)))
+            return self.first_of(targets, ast.List([values], LOAD), self.continuation(cont))
         target = node.targets[0]
         if isinstance(target, (ast.Attribute, ast.Subscript, ast.Tuple, ast.List)):
-            return f'[{cont} for {self.apply_handler(target)} in [{self.apply_handler(node.value)}]][0]'
-        return construct_lambda({self.apply_handler(target): self.apply_handler(node.value)}, cont)
+            return self.first_of(store(self.apply_handler(target)), ast.List([value], LOAD), self.continuation(cont))
+        return let({self.target_name(target): value}, self.continuation(cont))
 
-    def handle_augassign(self, node, cont) -> str:
+    def handle_augassign(self, node, cont):
         assign_equivalent = ast.Assign([node.target], ast.BinOp(node.target, node.op, node.value))
         return self.apply_handler(assign_equivalent, cont)
 
-    def handle_expr(self, node, cont) -> str:
+    def handle_expr(self, node, cont):
         return self.apply_handler(node.value, cont)
 
-    def handle_keyword(self, node, cont) -> str:
-        return f'{node.arg}={self.apply_handler(node.value)}'
-
-    def handle_call(self, node, cont) -> str:
-        args = ', '.join(self.apply_handler(child) for child in node.args + node.keywords)
-        call = f'{self.apply_handler(node.func)}({args})'
-        return call if not cont else f'[{call}, {cont}][-1]'
-
-    def handle_binop(self, node, cont) -> str:
-        op_map = {
-            ast.Add: '+',
-            ast.Sub: '-',
-            ast.Mult: '*',
-            ast.Div: '/',
-            ast.FloorDiv: '//',
-            ast.Mod: '%',
-            ast.Pow: '**',
-            ast.LShift: '<<',
-            ast.RShift: '>>',
-            ast.BitOr: '|',
-            ast.BitXor: '^',
-            ast.BitAnd: '&',
-        }
-        return f'({self.apply_handler(node.left)} {op_map[type(node.op)]} {self.apply_handler(node.right)})'
-
-    def handle_boolop(self, node, cont) -> str:
-        op_map = {
-            ast.And: 'and',
-            ast.Or: 'or',
-        }
-        return f' {op_map[type(node.op)]} '.join(self.apply_handler(child) for child in node.values)
-
-    def handle_unaryop(self, node, cont) -> str:
-        op_map = {
-            ast.UAdd: '+',
-            ast.USub: '-',
-            ast.Not: 'not ',
-            ast.Invert: '~',
-        }
-        if isinstance(node.operand, (ast.Name, ast.Constant)):
-            return f'{op_map[type(node.op)]}{self.apply_handler(node.operand)}'
-        return f'{op_map[type(node.op)]}({self.apply_handler(node.operand)})'
-
-    def handle_if(self, node, cont) -> str:
-        return f'({self.apply_handler(node.body, cont)} if {self.apply_handler(node.test)} else {self.apply_handler(node.orelse, cont)})'
-
-    def handle_compare(self, node, cont) -> str:
-        op_map = {
-            ast.Gt: '>',
-            ast.Lt: '<',
-            ast.GtE: '>=',
-            ast.LtE: '<=',
-            ast.Eq: '==',
-            ast.NotEq: '!=',
-            ast.In: 'in',
-            ast.Is: 'is',
-            ast.IsNot: 'is not',
-            ast.NotIn: 'not in',
-        }
-        comparisons = ''.join(f' {op_map[type(op)]} ' + self.apply_handler(val)
-                              for op, val in zip(node.ops, node.comparators))
-        return f'({self.apply_handler(node.left)}{comparisons})'
-
-    # def handle_methoddef(self, node, cont) -> str:
-    #     all_args = [arg.arg for arg in node.args.args]
-    #     defaults = [f'={self.apply_handler(val)}' for val in node.args.defaults]
-    #     padding = [''] * (len(all_args) - len(defaults))
-    #     args = ', '.join(arg + val for arg, val in zip(all_args, padding + defaults))
-    #     for n in ast.walk(node):
-    #         if cont and isinstance(n, ast.Call) and self.apply_handler(n.func) == cont.split('.')[0]:
-    #             n.func.id = 'self.__class__'
-    #     if cont.endswith('__init__'):
-    #         return f'lambda{" " if args else ""}{args}: [{self.apply_handler(node.body)}, None][-1]'
-    #     if any(isinstance(n, ast.Call) and self.apply_handler(n.func) == node.name for n in ast.walk(node)):
-    #         self.needs_y = True
-    #         return f'_Y(lambda {node.name}: (lambda {args}: {self.apply_handler(node.body)}))'
-    #     return f'lambda{" " if args else ""}{args}: {self.apply_handler(node.body)}'
-    
-    def handle_methoddef(self, node, cont) -> str:
-        # Extract all argument names
+    def handle_keyword(self, node, cont):
+        return ast.keyword(node.arg, self.apply_handler(node.value))
+
+    def handle_call(self, node, cont):
+        args = [self.apply_handler(child) for child in node.args]
+        keywords = [self.apply_handler(child) for child in node.keywords]
+        result = ast.Call(self.apply_handler(node.func), args, keywords)
+        if cont is None:
+            return result
+        return ast.Subscript(ast.List([result, cont], LOAD), ast.UnaryOp(ast.USub(), ast.Constant(1)),
+                             LOAD)
+
+    def handle_binop(self, node, cont):
+        return ast.BinOp(self.apply_handler(node.left), type(node.op)(), self.apply_handler(node.right))
+
+    def handle_boolop(self, node, cont):
+        return ast.BoolOp(type(node.op)(), [self.apply_handler(child) for child in node.values])
+
+    def handle_unaryop(self, node, cont):
+        return ast.UnaryOp(type(node.op)(), self.apply_handler(node.operand))
+
+    def handle_if(self, node, cont):
+        join = getattr(node, 'join', None)
+        if join is None or cont is None:
+            return ast.IfExp(self.apply_handler(node.test), self.apply_handler(node.body, cont),
+                             self.apply_handler(node.orelse, cont))
+        join_id = f'_join{self.join_no}'
+        self.join_no += 1
+        body, orelse = [call(name(join_id), [self.join_value(end, v) for v in join]) for end in node.ends]
+        branches = ast.IfExp(self.apply_handler(node.test), self.apply_handler(node.body, body),
+                             self.apply_handler(node.orelse, orelse))
+        return let({join_id: make_lambda(join, cont)}, branches)
+
+    def handle_compare(self, node, cont):
+        return ast.Compare(self.apply_handler(node.left), [type(op)() for op in node.ops],
+                           [self.apply_handler(val) for val in node.comparators])
+
+    def handle_methoddef(self, node, cont):
         all_args = [arg.arg for arg in node.args.args]
-        
-        # Handle defaults
-        defaults = [f'={self.apply_handler(val)}' for val in node.args.defaults]
-        padding = [''] * (len(all_args) - len(defaults))
-        
-        # Create argument string - ensure no tuples in parameter position
-        args_str = ", ".join(all_args)  # Join as individual parameters
-        
-        # Add default values correctly 
-        if defaults:
-            args_with_defaults = []
-            for i, arg in enumerate(all_args):
-                if i >= len(all_args) - len(defaults):
-                    default_idx = i - (len(all_args) - len(defaults))
-                    args_with_defaults.append(f"{arg}{defaults[default_idx]}")
-                else:
-                    args_with_defaults.append(arg)
-            args_str = ", ".join(args_with_defaults)
-        
-        # Handle recursive function calls
+        defaults = [self.apply_handler(val) for val in node.args.defaults]
         for n in ast.walk(node):
-            if cont and isinstance(n, ast.Call) and self.apply_handler(n.func) == cont.split('.')[0]:
+            if cont and isinstance(n, ast.Call) and self.target_name(n.func) == cont.split('.')[0]:
                 n.func.id = 'self.__class__'
-                
-        # Create appropriate lambda
         if cont.endswith('__init__'):
-            return f'lambda{" " if args_str else ""}{args_str}: [{self.apply_handler(node.body)}, None][-1]'
-        if any(isinstance(n, ast.Call) and self.apply_handler(n.func) == node.name for n in ast.walk(node)):
+            body = ast.List([self.apply_handler(node.body), ast.Constant(None)], LOAD)
+            return make_lambda(all_args, ast.Subscript(body, ast.UnaryOp(ast.USub(), ast.Constant(1)), LOAD),
+                               defaults)
+        if any(isinstance(n, ast.Call) and self.target_name(n.func) == node.name for n in ast.walk(node)):
             self.needs_y = True
-            return f'_Y(lambda {node.name}: (lambda {args_str}: {self.apply_handler(node.body)}))'
-        return f'lambda{" " if args_str else ""}{args_str}: {self.apply_handler(node.body)}'
+            return call(name('_Y'), [make_lambda([node.name], make_lambda(all_args, self.apply_handler(node.body),
+                                                                          defaults))])
+        return make_lambda(all_args, self.apply_handler(node.body), defaults)
 
-    def handle_functiondef(self, node, cont) -> str:
+    def handle_functiondef(self, node, cont):
         curr = self.handle_methoddef(node, '')
         for n in node.decorator_list[::-1]:
-            curr = f"{self.apply_handler(n)}({curr})"
-        # return construct_lambda({node.name: curr}, cont) # Removed this to avoid wrapping expression in lambda: None
+            curr = call(self.apply_handler(n), [curr])
         return curr
 
-    def handle_classdef(self, node, cont) -> str:
+    def handle_classdef(self, node, cont):
         attr_dict = {}
         for n in node.body:
             if isinstance(n, ast.FunctionDef):
                 attr_dict[n.name] = self.handle_methoddef(n, f'{node.name}.{n.name}')
-        bases = ''.join(self.apply_handler(n) + ', ' for n in node.bases)
-        attr_repr = '{' + ', '.join(f'{repr(k)}: {v}' for k, v in attr_dict.items()) + '}'
-        return construct_lambda({node.name: f'type("{node.name}", ({bases}), {attr_repr})'}, cont)
+        bases = ast.Tuple([self.apply_handler(n) for n in node.bases], LOAD)
+        attrs = ast.Dict([ast.Constant(k) for k in attr_dict], list(attr_dict.values()))
+        return let({node.name: call(name('type'), [ast.Constant(node.name), bases, attrs])}, self.continuation(cont))
 
-    def handle_return(self, node, cont) -> str:
+    def handle_return(self, node, cont):
         if node.value is None:
-            return 'None'
+            return ast.Constant(None)
         return self.apply_handler(node.value)
 
-    def handle_import(self, node, cont) -> str:
+    def handle_import(self, node, cont):
         imports = [(a.asname if a.asname else a.name, a.name) for a in node.names]
-        return construct_lambda({name.split('.')[0]: f"__import__('{mod}')" for name, mod in imports}, cont)
+        return let({n.split('.')[0]: call(name('__import__'), [ast.Constant(mod)]) for n, mod in imports},
+                   self.continuation(cont))
 
-    def handle_importfrom(self, node, cont) -> str:
+    def handle_importfrom(self, node, cont):
         imports = [(a.asname if a.asname else a.name, a.name) for a in node.names]
-        return construct_lambda({'_mod': f"__import__('{node.module}', {{}}, {{}}, {[i[1] for i in imports]})"},
-                                construct_lambda({name: f'_mod.{submodule}' for name, submodule in imports}, cont))
+        fromlist = ast.List([ast.Constant(i[1]) for i in imports], LOAD)
+        module = call(name('__import__'), [ast.Constant(node.module), ast.Dict([], []), ast.Dict([], []), fromlist])
+        return let({'_mod': module}, let({n: ast.Attribute(name('_mod'), sub, LOAD) for n, sub in imports},
+                                         self.continuation(cont)))
 
-    def handle_error(self, node, cont) -> str:
-        return ast.unparse(node)
+    def handle_error(self, node, cont):
+        return node
 
-    def unparse_list(self, body: list, cont=None) -> str:
+    def unparse_list(self, body: list, cont=None):
         temp = cont
         for node in body[::-1]:
             if not isinstance(node, ast.Expr) or isinstance(node.value, ast.Call):
                 temp = self.apply_handler(node, temp)
-        return str(temp)
+        return self.continuation(temp)
 
-    def unparse(self) -> str:
+    def flatten(self) -> ast.Expression:
         """
-        Unparses the ast.
+        Returns the AST of the flattened expression, without source locations. The continuation of a statement
+        that is duplicated in the source, like the one of an if statement, is a single subtree shared by its
+        occurrences, which transform_lambda transforms once.
         """
         self.needs_y = False
         self.loop_no = 1
+        self.join_no = 1
         curr = self.ast
-        if hasattr(curr, 'body') and isinstance(curr.body, list):
-            body = self.apply_handler(curr.body)
-            return provide_y(body) if self.needs_y else body
+        LoopAnalysis(self).annotate(curr.body)
+        body = self.apply_handler(curr.body)
+        if self.needs_y:
+            body = let({'_Y': ast.parse(Y_COMBINATOR, mode='eval').body}, body)
+        return ast.Expression(body)
+
+    def unparse(self) -> str:
+        """
+        Unparses the ast.
+        """
+        if hasattr(self.ast, 'body') and isinstance(self.ast.body, list):
+            return ast.unparse(self.flatten())
         return 'Unparse unsuccessful.'
+
+
+class AstFlatliner(Flatliner):
+    """
+    Flatliner whose unparse returns the AST of the flattened expression instead of its source, which the
+    transformations take without parsing it again.
+    """
+
+    def unparse(self) -> ast.Expression:
+        return self.flatten()
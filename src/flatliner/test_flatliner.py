@@ -0,0 +1,173 @@
+import ast
+import os
+import sys
+
+import pytest
+
+from flatliner import Flatliner, AstFlatliner
+
+REARC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'reArc')
+sys.path.insert(0, REARC)
+
+import curried_random
+import registry
+import transformed_functions
+
+LOOPS = ['y', 'fold']
+
+# functions f with the arguments they are called with
+PROGRAMS = {
+    'for_break_continue': ('''
+def f(n):
+    s = 0
+    for i in range(n):
+        if i % 3 == 0:
+            continue
+        s += i
+        if s > 50:
+            break
+    return s
+''', [(0,), (5,), (20,), (100,)]),
+    'nested_while': ('''
+def f(n):
+    total = 0
+    i = 0
+    while i < n:
+        j = 0
+        while j < i:
+            if (i + j) % 2:
+                total += j
+            j += 1
+        i += 1
+    return total
+''', [(0,), (1,), (7,)]),
+    'nested_for_tuple_targets': ('''
+def f(rows):
+    cells = []
+    for i, row in enumerate(rows):
+        for j, value in enumerate(row):
+            if value:
+                cells.append((i, j, value))
+    return cells
+''', [([],), ([[0, 1], [2, 0]],), ([[3, 0, 4]],)]),
+    'conditionally_bound': ('''
+def f(n):
+    for i in range(n):
+        last = i * i
+    if n:
+        return last
+    return None
+''', [(0,), (4,)]),
+    'maybe_bound': ('''
+def f(n):
+    if n % 2:
+        last = -1
+    for i in range(n // 2):
+        last = i
+    if n % 2 or n > 1:
+        return last
+    return None
+''', [(0,), (1,), (2,), (5,)]),
+    'consecutive_ifs': ('''
+def f(x):
+    y = 0
+    if x > 1:
+        y += 1
+    if x > 2:
+        y += 2
+    else:
+        y -= 1
+    if x > 3:
+        return y * 10
+    return y
+''', [(0,), (2,), (3,), (4,)]),
+    'return_in_loop': ('''
+def f(items):
+    for k, item in enumerate(items):
+        if item < 0:
+            return k
+    return -1
+''', [([],), ([1, 2],), ([1, -2, -3],)]),
+}
+
+TRAILING = {
+    'trailing_if': 'x = 1\nif x:\n    y = 2',
+    'trailing_while': 'n = 3\nwhile n:\n    n -= 1',
+    'trailing_for': 'for i in range(3): pass',
+}
+
+GENERATORS = ['007bbfb7', '00d62c1b', '017c7c7b', '0520fde7', '05269061', '0a938d79', '1b2d62fb', '1e0a9b12']
+
+
+def flatten(flatliner: Flatliner, source: str):
+    flatliner.ast = ast.parse(source)
+    return flatliner.unparse()
+
+
+def flattened(source: str, loops: str, namespace: dict = None):
+    """ the values of the flattened source from the source and the AST backend """
+    namespace = {'loop_fold': transformed_functions.loop_fold, **(namespace or dict())}
+    tree = ast.fix_missing_locations(flatten(AstFlatliner(loops), source))
+    return eval(flatten(Flatliner(loops), source), dict(namespace)), eval(compile(tree, '<flatliner>', 'eval'), dict(namespace))
+
+
+@pytest.mark.parametrize('loops', LOOPS)
+@pytest.mark.parametrize('key', PROGRAMS)
+def test_flattened_programs_match_originals(key, loops):
+    source, calls = PROGRAMS[key]
+    namespace = dict()
+    exec(source, namespace)
+    for function in flattened(source, loops):
+        for args in calls:
+            assert function(*args) == namespace['f'](*args)
+
+
+@pytest.mark.parametrize('loops', LOOPS)
+@pytest.mark.parametrize('key', GENERATORS)
+def test_flattened_generators_match_originals(key, loops):
+    with open(os.path.join(REARC, 'generator_functions', f'generate_{key}.py')) as f:
+        source = f.read()
+    namespace = registry.Source('generators').namespace()
+    original = dict(namespace)
+    exec(source, original)
+    for generator in flattened(source, loops, namespace):
+        for seed in range(3):
+            with curried_random.using(curried_random.Random(seed)):
+                expected = original[f'generate_{key}'](0, 1)
+            with curried_random.using(curried_random.Random(seed)):
+                assert generator(0, 1) == expected
+
+
+def test_fold_lowering_runs_loops_beyond_the_recursion_limit():
+    source = 'def f(n):\n    s = 0\n    while s < n:\n        s += 1\n    return s'
+    n = 2 * sys.getrecursionlimit()
+    for function in flattened(source, 'fold'):
+        assert function(n) == n
+    for function in flattened(source, 'y'):
+        with pytest.raises(RecursionError):
+            function(n)
+
+
+@pytest.mark.parametrize('key, probed', [('nested_while', False), ('conditionally_bound', False), ('maybe_bound', True)])
+def test_only_maybe_bound_loop_variables_are_probed(key, probed):
+    assert ('dir()' in flatten(Flatliner(), PROGRAMS[key][0])) == probed
+
+
+@pytest.mark.parametrize('loops', LOOPS)
+def test_join_points_keep_consecutive_ifs_linear(loops):
+    def source(n):
+        branches = ''.join(f'    if x > {i}:\n        y += {i}\n    else:\n        y -= 1\n' for i in range(n))
+        return f'def f(x):\n    y = 0\n{branches}    return y'
+
+    sizes = [len(flatten(Flatliner(loops), source(n))) for n in (8, 16)]
+    assert sizes[1] < 2.5 * sizes[0]
+    namespace = dict()
+    exec(source(16), namespace)
+    for function in flattened(source(16), loops):
+        assert [function(x) for x in range(20)] == [namespace['f'](x) for x in range(20)]
+
+
+@pytest.mark.parametrize('source', TRAILING.values(), ids=TRAILING.keys())
+def test_trailing_compound_statement_evaluates_to_none(source):
+    for value in flattened(source, 'y'):
+        assert value is None
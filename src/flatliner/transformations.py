@@ -85,6 +85,8 @@ class OperatorTransformer(ast.NodeTransformer):
         ast.Is: "isComp",
         ast.IsNot: "isNot",
     }
+    # the operands of comparisons are not visited
+    skips_children = True
 
     def visit_BinOp(self, node):
         # Convert binary operators (+, -, *, //, etc.)
@@ -247,6 +249,8 @@ class TaggerTransformer(ast.NodeTransformer):
             - dictionaries,
             - kleene stars (*).
     """
+    # the elements of lists and tuples are not visited
+    skips_children = True
 
     def visit_List(self, node):
         # Wrap the tuple elements in a call to a special function.
@@ -697,33 +701,61 @@ def transform_lambda_string(s):
     result.append(s[last_end:])
     return "".join(result)
 
+def visit_shared(transformer, tree):
+    """
+    Applies a transformer to a tree whose subtrees may be shared, like the trees of the AstFlatliner,
+    transforming each node once and sharing the result. The transformers rewrite nodes in place, so
+    the nodes are copied before they are transformed by a transformer that leaves some children of
+    a node unvisited, where a shared subtree must keep its original form.
+    """
+    visited = {}
+    visit = transformer.visit
+    copy = getattr(transformer, 'skips_children', False)
+
+    def visit_once(node):
+        key = id(node)
+        if key not in visited:
+            original = node
+            if copy and node.__class__ not in (ast.Name, ast.Constant):
+                fields = dict(node.__dict__)
+                for field, value in fields.items():
+                    if value.__class__ is list:
+                        fields[field] = value[:]
+                node = node.__class__.__new__(node.__class__)
+                node.__dict__ = fields
+            visited[key] = original, visit(node)
+        return visited[key][1]
+
+    transformer.visit = visit_once
+    return transformer.visit(tree)
+
+
 def transform_lambda(expr_str):
     """
-    Applies the transformations to the input lambda expression.
+    Applies the transformations to the input lambda expression, given as a string or as the
+    ast.Expression returned by the AstFlatliner, which is transformed in place.
     """
     # Parse the expression. We use mode='eval' because the input is a single expression.
-    tree = ast.parse(expr_str, mode='eval')
-                                                    # ------------ Examples ------------
-    tree = OperatorTransformer().visit(tree)        # 13+2                  -> add(13, 2)
-    tree = BoolOpTransformer().visit(tree)          # x and y               -> andOp(x, y)
-    tree = BitOpTransformer().visit(tree)           # x | y                 -> bitOr(x, y)
-    tree = IfExpTransformer().visit(tree)           # if z then x else y    -> ifElse(z, x, y)
-    tree = GeneratorExpTransformer().visit(tree)    # x for x in y if z     -> __genExpr__(x, x, y, z)
-    tree = TaggerTransformer().visit(tree)          # [x, y]                -> __list__(x, y)
-    tree = MethodCallTransformer().visit(tree)      # x.index(3)            -> index_M(x, 3)
+    tree = expr_str if isinstance(expr_str, ast.AST) else ast.parse(expr_str, mode='eval')
+                                                                # ------------ Examples ------------
+    tree = visit_shared(OperatorTransformer(), tree)            # 13+2                  -> add(13, 2)
+    tree = visit_shared(BoolOpTransformer(), tree)              # x and y               -> andOp(x, y)
+    tree = visit_shared(BitOpTransformer(), tree)               # x | y                 -> bitOr(x, y)
+    tree = visit_shared(IfExpTransformer(), tree)               # if z then x else y    -> ifElse(z, x, y)
+    tree = visit_shared(GeneratorExpTransformer(), tree)        # x for x in y if z     -> __genExpr__(x, x, y, z)
+    tree = visit_shared(TaggerTransformer(), tree)              # [x, y]                -> __list__(x, y)
+    tree = visit_shared(MethodCallTransformer(), tree)          # x.index(3)            -> index_M(x, 3)
     
     # Transform all nested structures
-    tree = NestedStructureTransformer().visit(tree) # TODO: still misses elements e.g. strings nested in a tuple nested in a dictionary
-                                                    # dict(__list__(__tuple__('input')(x19)) ... )
+    tree = visit_shared(NestedStructureTransformer(), tree)     # TODO: still misses elements e.g. strings nested in a tuple nested in a dictionary
+                                                                # dict(__list__(__tuple__('input')(x19)) ... )
 
-    tree = CurryTransformer().visit(tree)           # __genExpr__(z, x, y)  -> __genExpr__(z)(x)(y)
+    tree = visit_shared(CurryTransformer(), tree)               # __genExpr__(z, x, y)  -> __genExpr__(z)(x)(y)
 
 
-    tree = StripSubscriptTransformer().visit(tree)
+    tree = visit_shared(StripSubscriptTransformer(), tree)
 
-    ast.fix_missing_locations(tree)
-    
-    # Convert the AST back into code
+    # Convert the AST back into code, which needs no source locations
     new_expr = ast.unparse(tree)
 
     # Rename all variables bound by lambdas to x_i
@@ -0,0 +1,407 @@
+"""
+    Contains benchmarks comparing optimized DSL primitives against the reference implementations
+    they replaced. Each benchmark checks that both implementations agree before timing them.
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import threading
+import time
+import timeit
+
+import dsl
+from dsl import *
+
+import curried_random
+import currying
+import registry
+import transformed_functions
+
+
+def reference_curry(func):
+    """ currying decorator formerly copied into dsl, utils, curried_random and transformed_functions """
+    def curried(*args):
+        if len(args) == func.__code__.co_argcount:
+            return func(*args)
+        else:
+            return lambda x: curried(*(args + (x,)))
+    return curried
+
+
+def reference_objects(
+    grid: Grid,
+    univalued: Boolean,
+    diagonal: Boolean,
+    without_bg: Boolean
+) -> Objects:
+    """ set-based breadth first search formerly used by dsl.objects """
+    bg = mostcolor(grid) if without_bg else None
+    objs = set()
+    occupied = set()
+    h, w = len(grid), len(grid[0])
+    unvisited = asindices(grid)
+    diagfun = neighbors if diagonal else dneighbors
+    for loc in unvisited:
+        if loc in occupied:
+            continue
+        val = grid[loc[0]][loc[1]]
+        if val == bg:
+            continue
+        obj = {(val, loc)}
+        cands = {loc}
+        while len(cands) > 0:
+            neighborhood = set()
+            for cand in cands:
+                v = grid[cand[0]][cand[1]]
+                if (val == v) if univalued else (v != bg):
+                    obj.add((v, cand))
+                    occupied.add(cand)
+                    neighborhood |= {
+                        (i, j) for i, j in diagfun(cand) if 0 <= i < h and 0 <= j < w
+                    }
+            cands = neighborhood - occupied
+        objs.add(frozenset(obj))
+    return frozenset(objs)
+
+
+def reference_occurrences(
+    grid: Grid,
+    obj: Object
+) -> Indices:
+    """ exhaustive offset search formerly used by dsl.occurrences """
+    occurrences = set()
+    normed = normalize(obj)
+    h, w = len(grid), len(grid[0])
+    for i in range(h):
+        for j in range(w):
+            occurs = True
+            for v, (a, b) in shift(normed, (i, j)):
+                if 0 <= a < h and 0 <= b < w:
+                    if grid[a][b] != v:
+                        occurs = False
+                        break
+                else:
+                    occurs = False
+                    break
+            if occurs:
+                occurrences.add((i, j))
+    return frozenset(occurrences)
+
+
+def reference_hperiod(
+    obj: Object
+) -> Integer:
+    """ shift-and-prune search formerly used by dsl.hperiod """
+    normalized = normalize(obj)
+    w = width(normalized)
+    for p in range(1, w):
+        offsetted = shift(normalized, (0, -p))
+        pruned = frozenset({(c, (i, j)) for c, (i, j) in offsetted if j >= 0})
+        if pruned.issubset(normalized):
+            return p
+    return w
+
+
+def reference_vperiod(
+    obj: Object
+) -> Integer:
+    """ shift-and-prune search formerly used by dsl.vperiod """
+    normalized = normalize(obj)
+    h = height(normalized)
+    for p in range(1, h):
+        offsetted = shift(normalized, (-p, 0))
+        pruned = frozenset({(c, (i, j)) for c, (i, j) in offsetted if i >= 0})
+        if pruned.issubset(normalized):
+            return p
+    return h
+
+
+def reference_hupscale(
+    grid: Grid,
+    factor: Integer
+) -> Grid:
+    """ tuple concatenation formerly used by dsl.hupscale """
+    upscaled_grid = tuple()
+    for row in grid:
+        upscaled_row = tuple()
+        for value in row:
+            upscaled_row = upscaled_row + tuple(value for num in range(factor))
+        upscaled_grid = upscaled_grid + (upscaled_row,)
+    return upscaled_grid
+
+
+def reference_vupscale(
+    grid: Grid,
+    factor: Integer
+) -> Grid:
+    """ tuple concatenation formerly used by dsl.vupscale """
+    upscaled_grid = tuple()
+    for row in grid:
+        upscaled_grid = upscaled_grid + tuple(row for num in range(factor))
+    return upscaled_grid
+
+
+def reference_upscale(
+    grid: Grid,
+    factor: Integer
+) -> Grid:
+    """ tuple concatenation formerly used by dsl.upscale on grids """
+    upscaled_grid = tuple()
+    for row in grid:
+        upscaled_row = tuple()
+        for value in row:
+            upscaled_row = upscaled_row + tuple(value for num in range(factor))
+        upscaled_grid = upscaled_grid + tuple(upscaled_row for num in range(factor))
+    return upscaled_grid
+
+
+def reference_downscale(
+    grid: Grid,
+    factor: Integer
+) -> Grid:
+    """ tuple concatenation formerly used by dsl.downscale """
+    h, w = len(grid), len(grid[0])
+    downscaled_grid = tuple()
+    for i in range(h):
+        downscaled_row = tuple()
+        for j in range(w):
+            if j % factor == 0:
+                downscaled_row = downscaled_row + (grid[i][j],)
+        downscaled_grid = downscaled_grid + (downscaled_row, )
+    h = len(downscaled_grid)
+    downscaled_grid2 = tuple()
+    for i in range(h):
+        if i % factor == 0:
+            downscaled_grid2 = downscaled_grid2 + (downscaled_grid[i],)
+    return downscaled_grid2
+
+
+def reference_cellwise(
+    a: Grid,
+    b: Grid,
+    fallback: Integer
+) -> Grid:
+    """ tuple concatenation formerly used by dsl.cellwise """
+    h, w = len(a), len(a[0])
+    resulting_grid = tuple()
+    for i in range(h):
+        row = tuple()
+        for j in range(w):
+            a_value = a[i][j]
+            value = a_value if a_value == b[i][j] else fallback
+            row = row + (value,)
+        resulting_grid = resulting_grid + (row, )
+    return resulting_grid
+
+
+def random_grid(
+    h: Integer,
+    w: Integer,
+    n_colors: Integer,
+    rng: random.Random
+) -> Grid:
+    """ grid with a dominant background color and n_colors - 1 foreground colors """
+    weights = [3] + [1] * (n_colors - 1)
+    return tuple(tuple(rng.choices(range(n_colors), weights)[0] for j in range(w)) for i in range(h))
+
+
+def timed(
+    func: Callable,
+    number: Integer
+) -> float:
+    """ mean runtime of func in microseconds """
+    return timeit.timeit(func, number=number) / number * 1e6
+
+
+def benchmark_objects(
+    dims: Tuple = (3, 5, 10, 15, 20, 30),
+    n_colors: Integer = 4,
+    number: Integer = 20,
+    seed: Integer = 0
+) -> None:
+    """ compares dsl.objects against the reference implementation for all flag combinations """
+    rng = random.Random(seed)
+    flags = [(u, d, b) for u in (T, F) for d in (T, F) for b in (T, F)]
+    print(f'{"dims":>7} {"univalued/diagonal/without_bg":>30} {"reference":>12} {"objects":>12} {"speedup":>8}')
+    for dim in dims:
+        grid = random_grid(dim, dim, n_colors, rng)
+        for flag in flags:
+            assert objects(grid, *flag) == reference_objects(grid, *flag)
+            before = timed(lambda: reference_objects(grid, *flag), number)
+            after = timed(lambda: objects(grid, *flag), number)
+            print(f'{dim:>3}x{dim:<3} {str(flag):>30} {before:>10.1f}us {after:>10.1f}us {before / after:>7.2f}x')
+
+
+def benchmark_occurrences(
+    dims: Tuple = (3, 5, 10, 15, 20, 30),
+    n_colors: Integer = 4,
+    n_objects: Integer = 8,
+    number: Integer = 20,
+    seed: Integer = 0
+) -> None:
+    """ compares dsl.occurrences and dsl.batchoccurrences against the reference implementation """
+    rng = random.Random(seed)
+    print(f'{"dims":>7} {"reference":>12} {"occurrences":>12} {"batch":>12} {"speedup":>8}')
+    for dim in dims:
+        grid = random_grid(dim, dim, n_colors, rng)
+        objs = []
+        for k in range(n_objects):
+            start = (rng.randint(0, dim - 1), rng.randint(0, dim - 1))
+            dims_obj = (rng.randint(1, 3), rng.randint(1, 3))
+            objs.append(asobject(crop(grid, start, dims_obj)))
+        expected = tuple(reference_occurrences(grid, obj) for obj in objs)
+        assert tuple(occurrences(grid, obj) for obj in objs) == expected
+        assert batchoccurrences(grid, objs) == expected
+        before = timed(lambda: [reference_occurrences(grid, obj) for obj in objs], number)
+        after = timed(lambda: [occurrences(grid, obj) for obj in objs], number)
+        batch = timed(lambda: batchoccurrences(grid, objs), number)
+        print(f'{dim:>3}x{dim:<3} {before:>10.1f}us {after:>10.1f}us {batch:>10.1f}us {before / batch:>7.2f}x')
+
+
+def benchmark_periods(
+    dims: Tuple = (3, 5, 10, 15, 20, 30),
+    number: Integer = 20,
+    seed: Integer = 0
+) -> None:
+    """ compares dsl.hperiod, dsl.vperiod and dsl.period2d against the reference implementations """
+    rng = random.Random(seed)
+    print(f'{"dims":>7} {"object":>8} {"reference":>12} {"periods":>12} {"period2d":>12} {"speedup":>8}')
+    for dim in dims:
+        tile = random_grid(rng.randint(1, dim), rng.randint(1, dim), 3, rng)
+        grid = tuple(tuple(tile[i % len(tile)][j % len(tile[0])] for j in range(dim)) for i in range(dim))
+        full = asobject(grid)
+        partial = frozenset(cell for cell in full if rng.random() < 0.9)
+        for name, obj in (('full', full), ('partial', partial)):
+            expected = (reference_vperiod(obj), reference_hperiod(obj))
+            assert (vperiod(obj), hperiod(obj)) == period2d(obj) == expected
+            before = timed(lambda: (reference_vperiod(obj), reference_hperiod(obj)), number)
+            after = timed(lambda: (vperiod(obj), hperiod(obj)), number)
+            both = timed(lambda: period2d(obj), number)
+            print(f'{dim:>3}x{dim:<3} {name:>8} {before:>10.1f}us {after:>10.1f}us {both:>10.1f}us {before / both:>7.2f}x')
+
+
+def benchmark_resampling(
+    dims: Tuple = (5, 10, 20, 30),
+    factors: Tuple = (2, 4),
+    number: Integer = 20,
+    seed: Integer = 0
+) -> None:
+    """ compares the resampling primitives against the reference implementations, per output cell """
+    rng = random.Random(seed)
+    print(f'{"dims":>7} {"factor":>6} {"primitive":>10} {"reference":>12} {"dsl":>12} {"speedup":>8}')
+    for dim in dims:
+        grid, other = random_grid(dim, dim, 4, rng), random_grid(dim, dim, 4, rng)
+        for factor in factors:
+            cases = [
+                ('hupscale', reference_hupscale, (grid, factor)),
+                ('vupscale', reference_vupscale, (grid, factor)),
+                ('upscale', reference_upscale, (grid, factor)),
+                ('downscale', reference_downscale, (upscale(grid, factor), factor)),
+                ('cellwise', reference_cellwise, (upscale(grid, factor), upscale(other, factor), 0)),
+            ]
+            for name, reference, arguments in cases:
+                expected = reference(*arguments)
+                assert getattr(dsl, name)(*arguments) == expected
+                cells = len(expected) * len(expected[0])
+                before = timed(lambda: reference(*arguments), number) / cells
+                after = timed(lambda: getattr(dsl, name)(*arguments), number) / cells
+                print(f'{dim:>3}x{dim:<3} {factor:>6} {name:>10} {before * 1000:>10.0f}ns {after * 1000:>10.0f}ns {before / after:>7.2f}x')
+
+
+def benchmark_curry(
+    number: Integer = 1000000
+) -> None:
+    """ per-call overhead of the reference and shared currying decorators over an uncurried call """
+    def function(a, b, c):
+        return a
+    reference, curried = reference_curry(function), currying.curry(function)
+    base = timed(lambda: function(1, 2, 3), number)
+    print(f'{"call":>24} {"reference":>12} {"curry":>12}')
+    cases = [
+        ('full application', lambda f: f(1, 2, 3)),
+        ('partial application', lambda f: f(1)(2)(3)),
+        ('partial, then rest', lambda f: f(1, 2)(3)),
+    ]
+    for name, call in cases:
+        assert call(reference) == call(curried) == 1
+        before = timed(lambda: call(reference), number) - base
+        after = timed(lambda: call(curried), number) - base
+        print(f'{name:>24} {before * 1000:>10.0f}ns {after * 1000:>10.0f}ns')
+
+
+def benchmark_loop_lowering(
+    keys: Tuple = None,
+    n_examples: Integer = 5,
+    seed: Integer = 0,
+    recursion_limit: Integer = 100000
+) -> None:
+    """
+    compares the runtime of the generators flattened with loops lowered into Y combinator recursion and
+    into loop_fold, on generators whose flattened versions agree, counting those that exceed the recursion
+    limit, which the flattened generators run with in a thread with a large stack
+    """
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flatliner'))
+    from flatliner import Flatliner
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generator_functions')
+    namespace = {**registry.Source('generators').namespace(), 'loop_fold': transformed_functions.loop_fold}
+
+    def run(generator):
+        results, start = [], time.perf_counter()
+        for k in range(n_examples):
+            try:
+                with curried_random.using(curried_random.Random(seed + k)):
+                    results.append(generator(0, 1))
+            except Exception as e:
+                results.append(type(e).__name__)
+        return results, (time.perf_counter() - start) / n_examples * 1e3
+
+    def compare():
+        totals = {'y': 0, 'fold': 0}
+        n_recursion_errors = {'y': 0, 'fold': 0}
+        print(f'{"generator":>18} {"y":>12} {"fold":>12} {"speedup":>8}')
+        for fn in sorted(os.listdir(folder)):
+            if not fn.endswith('.py') or keys is not None and fn[9:-3] not in keys:
+                continue
+            results, times = dict(), dict()
+            try:
+                for loops in totals:
+                    flatliner = Flatliner(loops)
+                    flatliner.set_ast(os.path.join(folder, fn))
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        generator = eval(flatliner.unparse(), dict(namespace))
+                    results[loops], times[loops] = run(generator)
+            except Exception:
+                continue
+            for loops in totals:
+                n_recursion_errors[loops] += results[loops].count('RecursionError')
+            if 'RecursionError' in results['y'] + results['fold']:
+                continue
+            assert results['y'] == results['fold'], fn
+            for loops in totals:
+                totals[loops] += times[loops]
+            print(f'{fn[:-3]:>18} {times["y"]:>10.2f}ms {times["fold"]:>10.2f}ms {times["y"] / times["fold"]:>7.2f}x')
+        print(f'{"total":>18} {totals["y"]:>10.2f}ms {totals["fold"]:>10.2f}ms {totals["y"] / totals["fold"]:>7.2f}x')
+        print(f'examples exceeding the recursion limit: {n_recursion_errors}')
+
+    limit, stack_size = sys.getrecursionlimit(), threading.stack_size()
+    sys.setrecursionlimit(recursion_limit)
+    threading.stack_size(512 * 1024 * 1024)
+    try:
+        thread = threading.Thread(target=compare)
+        thread.start()
+        thread.join()
+    finally:
+        sys.setrecursionlimit(limit)
+        threading.stack_size(stack_size)
+
+
+if __name__ == '__main__':
+    benchmark_curry()
+    benchmark_objects()
+    benchmark_occurrences()
+    benchmark_periods()
+    benchmark_resampling()
+    benchmark_loop_lowering()
@@ -67,6 +67,11 @@ from itertools import accumulate as _accumulate, repeat as _repeat
 from bisect import bisect as _bisect
 import os as _os
 import _random
+from contextlib import contextmanager as _contextmanager
+from contextvars import ContextVar as _ContextVar
+
+import currying as _currying
+from currying import curry
 
 __all__ = [
     "Random",
@@ -75,6 +80,7 @@ __all__ = [
     "binomialvariate",
     "choice",
     "choices",
+    "current",
     "expovariate",
     "gammavariate",
     "gauss",
@@ -93,6 +99,7 @@ __all__ = [
     "shuffle",
     "triangular",
     "uniform",
+    "using",
     "vonmisesvariate",
     "weibullvariate",
 ]
@@ -106,15 +113,6 @@ _ONE = 1
 _sha512 = None
 
 
-def curry(func):
-    def curried(*args):
-        if len(args) == func.__code__.co_argcount:
-            return func(*args)
-        else:
-            return lambda x: curried(*(args + (x,)))
-    return curried
-
-
 class Random(_random.Random):
     """Random number generator base class used by bound module functions.
 
@@ -931,37 +929,67 @@ class SystemRandom(Random):
 
 
 # ----------------------------------------------------------------------
-# Create one instance, seeded from current time, and export its methods
-# as module-level functions.  The functions share state across all uses
-# (both in the user's code and in the Python libraries), but that's fine
-# for most programs and is easier for the casual user than making them
-# instantiate their own Random() instance.
+# Create one instance, seeded from current time, and export module-level
+# functions calling its methods.  The functions share its state across all
+# uses, unless another instance is injected for the current context with
+# `using`: each thread or asyncio task can then draw from its own instance,
+# e.g. one per generated example, without sharing any state.
 
 _inst = Random()
-seed = _inst.seed
-random = _inst.random
-uniform = _inst.uniform
-triangular = _inst.triangular
-randint = _inst.randint
-choice = _inst.choice
-randrange = _inst.randrange
-sample = _inst.sample
-shuffle = _inst.shuffle
-choices = _inst.choices
-normalvariate = _inst.normalvariate
-lognormvariate = _inst.lognormvariate
-expovariate = _inst.expovariate
-vonmisesvariate = _inst.vonmisesvariate
-gammavariate = _inst.gammavariate
-gauss = _inst.gauss
-betavariate = _inst.betavariate
-binomialvariate = _inst.binomialvariate
-paretovariate = _inst.paretovariate
-weibullvariate = _inst.weibullvariate
-getstate = _inst.getstate
-setstate = _inst.setstate
-getrandbits = _inst.getrandbits
-randbytes = _inst.randbytes
+_current = _ContextVar('curried_random', default=_inst)
+
+
+@_contextmanager
+def using(instance):
+    """Use instance for the module-level functions within the context."""
+    token = _current.set(instance)
+    try:
+        yield instance
+    finally:
+        _current.reset(token)
+
+
+def current():
+    """Return the instance the module-level functions use in this context."""
+    return _current.get()
+
+
+def _export(name):
+    method = getattr(Random, name)
+
+    def function(*args, **kwds):
+        return getattr(_current.get(), name)(*args, **kwds)
+    function.__name__ = function.__qualname__ = name
+    function.__doc__ = method.__doc__
+    if hasattr(method, '__code__'):
+        function.arity = _currying.arity(method) - 1
+    return function
+
+
+seed = _export('seed')
+random = _export('random')
+uniform = _export('uniform')
+triangular = _export('triangular')
+randint = _export('randint')
+choice = _export('choice')
+randrange = _export('randrange')
+sample = _export('sample')
+shuffle = _export('shuffle')
+choices = _export('choices')
+normalvariate = _export('normalvariate')
+lognormvariate = _export('lognormvariate')
+expovariate = _export('expovariate')
+vonmisesvariate = _export('vonmisesvariate')
+gammavariate = _export('gammavariate')
+gauss = _export('gauss')
+betavariate = _export('betavariate')
+binomialvariate = _export('binomialvariate')
+paretovariate = _export('paretovariate')
+weibullvariate = _export('weibullvariate')
+getstate = _export('getstate')
+setstate = _export('setstate')
+getrandbits = _export('getrandbits')
+randbytes = _export('randbytes')
 
 
 ## ------------------------------------------------------
@@ -0,0 +1,34 @@
+"""
+    Contains the currying decorator shared by the DSL, the utils, the curried random functions
+    and the transformed python functions.
+
+    A curried function evaluates as soon as it receives as many positional arguments as the
+    decorated function takes, and otherwise returns a `functools.partial` application of it.
+    Curried functions record the number of arguments they take in their `arity` attribute,
+    from which `arity` also derives the number of arguments a partial application still expects.
+"""
+
+import functools
+import types
+
+
+def curry(func):
+    n = func.__code__.co_argcount
+
+    @functools.wraps(func)
+    def curried(*args):
+        if len(args) == n:
+            return func(*args)
+        return functools.partial(curried, *args)
+    curried.arity = n
+    return curried
+
+
+def arity(function) -> int:
+    """ number of positional arguments a function takes, as seen by rbind and lbind """
+    if isinstance(function, types.MethodType):
+        return arity(function.__func__) - 1
+    if isinstance(function, functools.partial):
+        return arity(function.func) - len(function.args)
+    n = getattr(function, 'arity', None)
+    return function.__code__.co_argcount if n is None else n
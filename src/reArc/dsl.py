@@ -2,6 +2,11 @@
     Contains the standard re-arc DSL with one modification: all primitives with two or more arguments have been curried.
 """
 
+import functools
+
+import currying
+from currying import curry
+
 from typing import (
     List,
     Union,
@@ -68,15 +73,6 @@ TWO_BY_ZERO = (2, 0)
 TWO_BY_TWO = (2, 2)
 THREE_BY_THREE = (3, 3)
 
-def curry(func):
-    def curried(*args):
-        if len(args) == func.__code__.co_argcount:
-            return func(*args)
-        else:
-            return lambda x: curried(*(args + (x,)))
-    return curried
-
-
 # primitives
 
 def identity(
@@ -545,7 +541,7 @@ def rbind(
     fixed: Any
 ) -> Callable:
     """ fix the rightmost argument """
-    n = function.__code__.co_argcount
+    n = currying.arity(function)
     if n == 2:
         return lambda x: function(x, fixed)
     elif n == 3:
@@ -559,7 +555,7 @@ def lbind(
     fixed: Any
 ) -> Callable:
     """ fix the leftmost argument """
-    n = function.__code__.co_argcount
+    n = currying.arity(function)
     if n == 2:
         return lambda y: function(fixed, y)
     elif n == 3:
@@ -829,6 +825,18 @@ def neighbors(
     """ adjacent indices """
     return dneighbors(loc) | ineighbors(loc)
 
+@functools.lru_cache(maxsize=None)
+def _padded_layout(
+    h: Integer,
+    w: Integer
+) -> Tuple:
+    """ offsets of the cells of a padded h x w grid in the iteration order of asindices, and their locations """
+    indices = frozenset((i, j) for i in range(h) for j in range(w))
+    locations = [None] * ((h + 2) * (w + 2))
+    for i, j in indices:
+        locations[(i + 1) * (w + 2) + j + 1] = (i, j)
+    return tuple((i + 1) * (w + 2) + j + 1 for i, j in indices), tuple(locations)
+
 @curry
 def objects(
     grid: Grid,
@@ -838,30 +846,37 @@ def objects(
 ) -> Objects:
     """ objects occurring on the grid """
     bg = mostcolor(grid) if without_bg else None
-    objs = set()
-    occupied = set()
     h, w = len(grid), len(grid[0])
-    unvisited = asindices(grid)
-    diagfun = neighbors if diagonal else dneighbors
-    for loc in unvisited:
-        if loc in occupied:
-            continue
-        val = grid[loc[0]][loc[1]]
-        if val == bg:
+    stride = w + 2
+    values = [None] * (stride + 1)
+    for row in grid:
+        values.extend(row)
+        values.extend((None, None))
+    values.extend([None] * (stride - 1))
+    # cells on the border padding and background cells never join an object
+    seen = bytearray(b'\x01') * len(values)
+    for k in range(stride + 1, len(values) - stride, stride):
+        seen[k:k + w] = bytes(v == bg for v in values[k:k + w]) if without_bg else bytes(w)
+    offsets = (-stride, -1, 1, stride)
+    if diagonal:
+        offsets += (-stride - 1, -stride + 1, stride - 1, stride + 1)
+    order, locations = _padded_layout(h, w)
+    objs = set()
+    for start in order:
+        if seen[start]:
             continue
-        obj = {(val, loc)}
-        cands = {loc}
-        while len(cands) > 0:
-            neighborhood = set()
-            for cand in cands:
-                v = grid[cand[0]][cand[1]]
-                if (val == v) if univalued else (v != bg):
-                    obj.add((v, cand))
-                    occupied.add(cand)
-                    neighborhood |= {
-                        (i, j) for i, j in diagfun(cand) if 0 <= i < h and 0 <= j < w
-                    }
-            cands = neighborhood - occupied
+        seen[start] = 1
+        val = values[start]
+        obj = []
+        stack = [start]
+        while stack:
+            k = stack.pop()
+            obj.append((values[k], locations[k]))
+            for offset in offsets:
+                n = k + offset
+                if not seen[n] and (values[n] == val or not univalued):
+                    seen[n] = 1
+                    stack.append(n)
         objs.add(frozenset(obj))
     return frozenset(objs)
 
@@ -1152,13 +1167,7 @@ def hupscale(
     factor: Integer
 ) -> Grid:
     """ upscale grid horizontally """
-    upscaled_grid = tuple()
-    for row in grid:
-        upscaled_row = tuple()
-        for value in row:
-            upscaled_row = upscaled_row + tuple(value for num in range(factor))
-        upscaled_grid = upscaled_grid + (upscaled_row,)
-    return upscaled_grid
+    return tuple(tuple(value for value in row for num in range(factor)) for row in grid)
 
 @curry
 def vupscale(
@@ -1166,10 +1175,7 @@ def vupscale(
     factor: Integer
 ) -> Grid:
     """ upscale grid vertically """
-    upscaled_grid = tuple()
-    for row in grid:
-        upscaled_grid = upscaled_grid + tuple(row for num in range(factor))
-    return upscaled_grid
+    return tuple(row for row in grid for num in range(factor))
 
 @curry
 def upscale(
@@ -1178,13 +1184,11 @@ def upscale(
 ) -> Element:
     """ upscale object or grid """
     if isinstance(element, tuple):
-        upscaled_grid = tuple()
+        upscaled_grid = []
         for row in element:
-            upscaled_row = tuple()
-            for value in row:
-                upscaled_row = upscaled_row + tuple(value for num in range(factor))
-            upscaled_grid = upscaled_grid + tuple(upscaled_row for num in range(factor))
-        return upscaled_grid
+            upscaled_row = tuple(value for value in row for num in range(factor))
+            upscaled_grid.extend(upscaled_row for num in range(factor))
+        return tuple(upscaled_grid)
     else:
         if len(element) == 0:
             return frozenset()
@@ -1205,19 +1209,9 @@ def downscale(
 ) -> Grid:
     """ downscale grid """
     h, w = len(grid), len(grid[0])
-    downscaled_grid = tuple()
-    for i in range(h):
-        downscaled_row = tuple()
-        for j in range(w):
-            if j % factor == 0:
-                downscaled_row = downscaled_row + (grid[i][j],)
-        downscaled_grid = downscaled_grid + (downscaled_row, )
-    h = len(downscaled_grid)
-    downscaled_grid2 = tuple()
-    for i in range(h):
-        if i % factor == 0:
-            downscaled_grid2 = downscaled_grid2 + (downscaled_grid[i],)
-    return downscaled_grid2
+    columns = [j for j in range(w) if j % factor == 0]
+    rows = [i for i in range(h) if i % factor == 0]
+    return tuple(tuple(grid[i][j] for j in columns) for i in rows)
 
 @curry
 def hconcat(
@@ -1271,15 +1265,14 @@ def cellwise(
 ) -> Grid:
     """ cellwise match of two grids """
     h, w = len(a), len(a[0])
-    resulting_grid = tuple()
+    resulting_grid = []
     for i in range(h):
-        row = tuple()
+        row = []
         for j in range(w):
             a_value = a[i][j]
-            value = a_value if a_value == b[i][j] else fallback
-            row = row + (value,)
-        resulting_grid = resulting_grid + (row, )
-    return resulting_grid
+            row.append(a_value if a_value == b[i][j] else fallback)
+        resulting_grid.append(tuple(row))
+    return tuple(resulting_grid)
 
 @curry
 def replace(
@@ -1524,30 +1517,63 @@ def shoot(
     """ line from starting point and direction """
     return connect(start, (start[0] + 42 * direction[0], start[1] + 42 * direction[1]))
 
-@curry
-def occurrences(
-    grid: Grid,
+def _cellindex(
+    grid: Grid
+) -> Tuple:
+    """ dimensions, flattened cells and flat positions of each color of a grid """
+    h, w = len(grid), len(grid[0])
+    flat = [v for row in grid for v in row]
+    positions = dict()
+    for k, v in enumerate(flat):
+        positions.setdefault(v, []).append(k)
+    return h, w, flat, positions
+
+def _occurrences(
+    index: Tuple,
     obj: Object
 ) -> Indices:
-    """ locations of occurrences of object in grid """
+    """ locations of occurrences of object in an indexed grid """
+    h, w, flat, positions = index
     occurrences = set()
     normed = normalize(obj)
-    h, w = len(grid), len(grid[0])
-    for i in range(h):
-        for j in range(w):
-            occurs = True
-            for v, (a, b) in shift(normed, (i, j)):
-                if 0 <= a < h and 0 <= b < w:
-                    if grid[a][b] != v:
-                        occurs = False
-                        break
-                else:
-                    occurs = False
+    if len(normed) == 0:
+        for i in range(h):
+            for j in range(w):
+                occurrences.add((i, j))
+        return frozenset(occurrences)
+    cells = [(a * w + b, v) for v, (a, b) in normed]
+    oh, ow = shape(normed)
+    # only offsets that align the rarest color of the object with a grid cell of that color can match
+    av, (ai, aj) = min(normed, key=lambda cell: len(positions.get(cell[0], ())))
+    for k in positions.get(av, ()):
+        i, j = divmod(k, w)
+        i, j = i - ai, j - aj
+        if 0 <= i <= h - oh and 0 <= j <= w - ow:
+            start = i * w + j
+            for offset, v in cells:
+                if flat[start + offset] != v:
                     break
-            if occurs:
+            else:
                 occurrences.add((i, j))
     return frozenset(occurrences)
 
+@curry
+def occurrences(
+    grid: Grid,
+    obj: Object
+) -> Indices:
+    """ locations of occurrences of object in grid """
+    return _occurrences(_cellindex(grid), obj)
+
+@curry
+def batchoccurrences(
+    grid: Grid,
+    objs: Container
+) -> Tuple:
+    """ locations of occurrences of each of the objects in grid, in the order of the objects """
+    index = _cellindex(grid)
+    return tuple(_occurrences(index, obj) for obj in objs)
+
 def frontiers(
     grid: Grid
 ) -> Objects:
@@ -1567,28 +1593,89 @@ def compress(
     ci = tuple(j for j in range(len(grid[0])) if len(set(grid[i][j] for i in range(len(grid)))) == 1)
     return tuple(tuple(v for j, v in enumerate(r) if j not in ci) for i, r in enumerate(grid) if i not in ri)
 
+def _colorrows(
+    obj: Object
+) -> Tuple:
+    """ rows of colors of an object that covers its bounding box once, None for any other object """
+    colors = {loc: c for c, loc in obj}
+    if len(colors) == 0 or len(colors) != len(obj):
+        return None
+    top = min(i for i, j in colors)
+    left = min(j for i, j in colors)
+    h = max(i for i, j in colors) - top + 1
+    w = max(j for i, j in colors) - left + 1
+    if h * w != len(colors):
+        return None
+    return tuple(tuple(colors[(i, j)] for j in range(left, left + w)) for i in range(top, top + h))
+
+def _smallestperiod(
+    sequences: Container,
+    n: Integer
+) -> Integer:
+    """ smallest p < n that is a period of all sequences of length n, n if there is none """
+    common = None
+    for sequence in sequences:
+        border = [0] * n
+        k = 0
+        for q in range(1, n):
+            while k > 0 and sequence[k] != sequence[q]:
+                k = border[k - 1]
+            if sequence[k] == sequence[q]:
+                k += 1
+            border[q] = k
+        periods = set()
+        k = border[-1]
+        while k > 0:
+            periods.add(n - k)
+            k = border[k - 1]
+        common = periods if common is None else common & periods
+        if len(common) == 0:
+            return n
+    return min(common)
+
+def _partialperiod(
+    obj: Object,
+    vertical: Boolean
+) -> Integer:
+    """ smallest p such that shifting an object by p towards the origin only hits its own cells """
+    if len(obj) == 0:
+        return 0
+    obj = frozenset(obj)
+    if vertical:
+        top = uppermost(obj)
+        for p in range(1, lowermost(obj) - top + 1):
+            if all((c, (i - p, j)) in obj for c, (i, j) in obj if i >= top + p):
+                return p
+        return lowermost(obj) - top + 1
+    left = leftmost(obj)
+    for p in range(1, rightmost(obj) - left + 1):
+        if all((c, (i, j - p)) in obj for c, (i, j) in obj if j >= left + p):
+            return p
+    return rightmost(obj) - left + 1
+
 def hperiod(
     obj: Object
 ) -> Integer:
     """ horizontal periodicity """
-    normalized = normalize(obj)
-    w = width(normalized)
-    for p in range(1, w):
-        offsetted = shift(normalized, (0, -p))
-        pruned = frozenset({(c, (i, j)) for c, (i, j) in offsetted if j >= 0})
-        if pruned.issubset(normalized):
-            return p
-    return w
+    rows = _colorrows(obj)
+    if rows is None:
+        return _partialperiod(obj, False)
+    return _smallestperiod(set(rows), len(rows[0]))
 
 def vperiod(
     obj: Object
 ) -> Integer:
     """ vertical periodicity """
-    normalized = normalize(obj)
-    h = height(normalized)
-    for p in range(1, h):
-        offsetted = shift(normalized, (-p, 0))
-        pruned = frozenset({(c, (i, j)) for c, (i, j) in offsetted if i >= 0})
-        if pruned.issubset(normalized):
-            return p
-    return h
+    rows = _colorrows(obj)
+    if rows is None:
+        return _partialperiod(obj, True)
+    return _smallestperiod(set(zip(*rows)), len(rows))
+
+def period2d(
+    obj: Object
+) -> IntegerTuple:
+    """ vertical and horizontal periodicity """
+    rows = _colorrows(obj)
+    if rows is None:
+        return _partialperiod(obj, True), _partialperiod(obj, False)
+    return _smallestperiod(set(zip(*rows)), len(rows)), _smallestperiod(set(rows), len(rows[0]))
@@ -1,5 +1,6 @@
 from dsl import *
 from utils import *
+from curried_random import choice, randint, sample, shuffle, uniform
 
 
 
@@ -0,0 +1,297 @@
+"""
+    Contains an optional copy-on-write grid builder for the editing primitives of the re-arc DSL.
+
+    Grids produced by the builder are `GridBuilder`s: lazy grids that record the edits made by
+    fill, paint, underfill, underpaint, cover and move on top of the grid they were derived
+    from. Chains of edits such as `gi = fill(gi, col, ...)` in a loop are coalesced, and the
+    Tuple[Tuple[int]] grid is only built once, in a single pass over all pending edits, when
+    the grid is indexed, iterated, hashed or handed to one of the remaining DSL primitives.
+
+    Edited cells are resolved when an edit is made, so an invalid patch or object fails at the
+    same call as in the DSL; only the background color of underfill, underpaint and cover is
+    determined when the edits are applied, from the grid the edit was made on.
+
+    The builder is enabled per generator or verifier through `boundary`, which installs the
+    builder primitives for the duration of the call and casts the results back to plain
+    Tuple[Tuple[int]] grids.
+"""
+
+import functools
+import inspect
+
+import dsl
+from dsl import *
+
+import utils
+
+
+FILL, UNDER, COVER = 'fill', 'under', 'cover'
+
+
+class GridBuilder:
+    """ grid given by a parent grid and an edit on it, materialized as a tuple grid on demand """
+
+    __slots__ = ('parent', 'edit', 'shape', '_grid')
+
+    def __init__(self, parent, edit, shape):
+        self.parent = parent
+        self.edit = edit
+        self.shape = shape
+        self._grid = None
+
+    @property
+    def grid(self) -> Grid:
+        if self._grid is None:
+            edits = []
+            node = self
+            while type(node) is GridBuilder and node._grid is None:
+                edits.append(node.edit)
+                node = node.parent
+            rows = [list(row) for row in _tuple(node)]
+            for edit in reversed(edits):
+                _apply(rows, edit)
+            self._grid = tuple(tuple(row) for row in rows)
+            self.parent = self.edit = None
+        return self._grid
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        return self.grid[key]
+
+    def __iter__(self):
+        return iter(self.grid)
+
+    def __reversed__(self):
+        return reversed(self.grid)
+
+    def __contains__(self, row):
+        return row in self.grid
+
+    def __hash__(self):
+        return hash(self.grid)
+
+    def __eq__(self, other):
+        return self.grid == _tuple(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        return self.grid < _tuple(other)
+
+    def __le__(self, other):
+        return self.grid <= _tuple(other)
+
+    def __gt__(self, other):
+        return self.grid > _tuple(other)
+
+    def __ge__(self, other):
+        return self.grid >= _tuple(other)
+
+    def __add__(self, other):
+        return self.grid + _tuple(other)
+
+    def __radd__(self, other):
+        return other + self.grid
+
+    def __mul__(self, n):
+        return self.grid * n
+
+    __rmul__ = __mul__
+
+    def count(self, row):
+        return self.grid.count(row)
+
+    def index(self, *args):
+        return self.grid.index(*args)
+
+    def __repr__(self):
+        return repr(self.grid)
+
+    def __reduce__(self):
+        return (tuple, (self.grid,))
+
+
+def _tuple(
+    value: Any
+) -> Any:
+    """ tuple grid of a builder grid, any other value unchanged """
+    return value.grid if type(value) is GridBuilder else value
+
+
+def _shape(
+    grid: Grid
+) -> IntegerTuple:
+    """ height and width of a grid, failing on empty grids like the DSL """
+    if type(grid) is GridBuilder:
+        return grid.shape
+    return len(grid), len(grid[0])
+
+
+def _mostcolor(
+    rows: List
+) -> Integer:
+    """ most common color of a grid given as a list of rows, tie-broken like the DSL """
+    values = [v for r in rows for v in r]
+    return max(set(values), key=values.count)
+
+
+def _apply(
+    rows: List,
+    edit: Tuple
+) -> None:
+    """ applies an edit to a grid given as a list of rows """
+    kind, cells = edit
+    if kind == FILL:
+        for i, j, value in cells:
+            rows[i][j] = value
+    elif kind == UNDER:
+        bg = _mostcolor(rows)
+        for i, j, value in cells:
+            if rows[i][j] == bg:
+                rows[i][j] = value
+    else:
+        bg = _mostcolor(rows)
+        for i, j in cells:
+            rows[i][j] = bg
+
+
+@curry
+def fill(
+    grid: Grid,
+    value: Integer,
+    patch: Patch
+) -> Grid:
+    """ fill value at indices """
+    h, w = _shape(grid)
+    cells = [(i, j, value) for i, j in toindices(patch) if 0 <= i < h and 0 <= j < w]
+    return GridBuilder(grid, (FILL, cells), (h, w))
+
+
+@curry
+def paint(
+    grid: Grid,
+    obj: Object
+) -> Grid:
+    """ paint object to grid """
+    h, w = _shape(grid)
+    cells = [(i, j, value) for value, (i, j) in obj if 0 <= i < h and 0 <= j < w]
+    return GridBuilder(grid, (FILL, cells), (h, w))
+
+
+@curry
+def underfill(
+    grid: Grid,
+    value: Integer,
+    patch: Patch
+) -> Grid:
+    """ fill value at indices that are background """
+    h, w = _shape(grid)
+    if w == 0:
+        return dsl.underfill(_tuple(grid), value, patch)
+    cells = [(i, j, value) for i, j in toindices(patch) if 0 <= i < h and 0 <= j < w]
+    return GridBuilder(grid, (UNDER, cells), (h, w))
+
+
+@curry
+def underpaint(
+    grid: Grid,
+    obj: Object
+) -> Grid:
+    """ paint object to grid where there is background """
+    h, w = _shape(grid)
+    if w == 0:
+        return dsl.underpaint(_tuple(grid), obj)
+    cells = [(i, j, value) for value, (i, j) in obj if 0 <= i < h and 0 <= j < w]
+    return GridBuilder(grid, (UNDER, cells), (h, w))
+
+
+@curry
+def cover(
+    grid: Grid,
+    patch: Patch
+) -> Grid:
+    """ remove object from grid """
+    h, w = _shape(grid)
+    if w == 0:
+        return dsl.cover(_tuple(grid), patch)
+    cells = [(i, j) for i, j in toindices(patch) if 0 <= i < h and 0 <= j < w]
+    return GridBuilder(grid, (COVER, cells), (h, w))
+
+
+@curry
+def move(
+    grid: Grid,
+    obj: Object,
+    offset: IntegerTuple
+) -> Grid:
+    """ move object on grid """
+    return paint(cover(grid, obj), shift(obj, offset))
+
+
+PRIMITIVES = {
+    'fill': fill,
+    'paint': paint,
+    'underfill': underfill,
+    'underpaint': underpaint,
+    'cover': cover,
+    'move': move,
+}
+
+
+def _materializing(
+    func: Callable
+) -> Callable:
+    """ wraps a DSL primitive such that builder grids are passed to it as tuple grids """
+    n = func.__code__.co_argcount
+    if n == 1:
+        wrapper = lambda a: func(_tuple(a))
+    elif n == 2:
+        wrapper = lambda a, b: func(_tuple(a), _tuple(b))
+    else:
+        wrapper = lambda *args: func(*map(_tuple, args))
+    return functools.wraps(func)(wrapper)
+
+
+MATERIALIZING = {
+    name: _materializing(func) for name, func in vars(dsl).items()
+    if inspect.isfunction(func) and func.__module__ == 'dsl' and name not in PRIMITIVES
+}
+
+
+def bindings(
+    namespace: dict
+) -> dict:
+    """ builder replacements for the names of a namespace that are bound to DSL primitives """
+    replacements = {**MATERIALIZING, **PRIMITIVES}
+    return {
+        name: func for name, func in replacements.items()
+        if namespace.get(name) is getattr(dsl, name)
+    }
+
+
+def detach(
+    value: Any
+) -> Any:
+    """ casts builder grids within a generated example or verifier output back to tuple grids """
+    if type(value) is GridBuilder:
+        return value.grid
+    if isinstance(value, dict):
+        return {k: detach(v) for k, v in value.items()}
+    if isinstance(value, (tuple, list)) and any(type(v) is GridBuilder for v in value):
+        return type(value)(detach(v) for v in value)
+    return value
+
+
+def boundary(
+    func: Callable
+) -> Callable:
+    """ runs a generator or verifier on the grid builder, returning tuple grids """
+    layered_func = utils.layered(func, bindings)
+
+    @functools.wraps(func)
+    def builder_func(*args):
+        return detach(layered_func(*args))
+    return builder_func
@@ -2,147 +2,598 @@ import time
 import tqdm
 import os
 import json
+import hashlib
+from contextlib import ExitStack
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
 
-from random import seed as set_seed
+import curried_random
 
 import dsl
 from dsl import *
 
-import utils
 from utils import *
 
-import generators
-import verifiers
+import grid_builder
+import memo
+import registry
+import scoring
+import supervisor
+import writers
 
 
 
-def get_generators() -> dict:
+def get_generators() -> registry.LazyMapping:
     """
-    returns mapper from task identifiers (keys) to example generator functions
+    returns mapper from task identifiers (keys) to example generator functions, loaded on first use
     """
-    prefix = 'generate_'
-    return {
-        strip_prefix(n, prefix): getattr(generators, n) for n in dir(generators) if n.startswith(prefix)
-    }
+    return registry.functions('generators', 'generate_')
 
 
-def get_verifiers() -> dict:
+def get_verifiers() -> registry.LazyMapping:
     """
-    returns mapper from task identifiers (keys) to example verifier functions
+    returns mapper from task identifiers (keys) to example verifier functions, loaded on first use
     """
-    prefix = 'verify_'
-    return {
-        strip_prefix(n, prefix): getattr(verifiers, n) for n in dir(verifiers) if n.startswith(prefix)
-    }
+    return registry.functions('verifiers', 'verify_')
 
 
 def get_rng_difficulty(
-    example: dict
+    difficulties: list
 ) -> float:
     """
     RNG-Difficulty: proxy measure for example difficulty, defined as the mean of sampled floats within example generation
     """
-    rng = getattr(utils, 'rng')
-    setattr(utils, 'rng', [])
-    return sum(rng) / len(rng)
-
-
-def get_pso_difficulty(
-    example: dict
-) -> float:
-    """
-    PSO-Difficulty: proxy measure for example difficulty, defined as weighted sum of #Pixels, #Symbols, #Objects
-    """
-    i, o = example['input'], example['output']
-    hwi = height(i) * width(i)
-    hwo = height(o) * width(o)
-    pix_pct = (hwi + hwo) / 1800
-    col_pct = len(palette(i) | palette(o)) / 10
-    obj_dens = (len(objects(i, T, F, F)) / hwi + len(objects(o, T, F, F)) / hwo) / 2
-    return (pix_pct + col_pct + obj_dens) / 3
+    return sum(difficulties) / len(difficulties)
 
 
 def demo_generator(key, n=6):
     with open(f'arc_original/training/{key}.json', 'r') as fp:
         original_task = json.load(fp)
     original_task = original_task['train'] + original_task['test']
-    generator = getattr(generators, f'generate_{key}')
+    generator = get_generators()[key]
     generated_examples = [generator(0, 1) for k in range(n)]
     plot_task(original_task)
     plot_task(generated_examples)
     
 
+def get_mappers(
+    use_grid_builder: bool = False,
+    use_memo: bool = False
+) -> tuple:
+    """
+    returns the generators and verifiers mappers, running on the requested optimization layers
+    """
+    generators_mapper = get_generators()
+    verifiers_mapper = get_verifiers()
+    if use_memo:
+        generators_mapper = generators_mapper.wrap(memo.boundary)
+        verifiers_mapper = verifiers_mapper.wrap(memo.boundary)
+    if use_grid_builder:
+        generators_mapper = generators_mapper.wrap(grid_builder.boundary)
+        verifiers_mapper = verifiers_mapper.wrap(grid_builder.boundary)
+    return generators_mapper, verifiers_mapper
+
+
+def task_seed(
+    seed: int,
+    key: str
+) -> int:
+    """
+    returns the seed of a task, derived from the dataset seed and the task key only
+    """
+    digest = hashlib.sha256(f'{seed}/{key}'.encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+REJECTION_REASONS = ('generation', 'timeout', 'verification', 'degenerate', 'duplicate')
+
+VERIFICATION_POLICIES = ('always', 'sampled', 'deferred')
+
+
+def verify_example(
+    verifier: Callable,
+    example: dict
+) -> tuple:
+    """
+    returns whether the verifier maps the example input to its output, and the seconds it took
+    """
+    start = time.time()
+    try:
+        verified = verifier(example['input']) == example['output']
+    except Exception:
+        verified = False
+    return verified, time.time() - start
+
+
+def generate_task(
+    key: str,
+    mappers: tuple,
+    path: str,
+    seed: int,
+    n_examples: int,
+    diff_lb: float,
+    diff_ub: float,
+    use_memo: bool = False,
+    task_format: str = 'json',
+    checkpoint_interval: float = 60,
+    max_attempts: int = None,
+    max_seconds: float = None,
+    verification: str = 'always',
+    verification_warmup: int = 100,
+    verification_fraction: float = 0.1,
+    verification_batch: int = 64,
+    example_timeout: float = None,
+    verifier_pool: Executor = None,
+    generator_supervisor: supervisor.Supervisor = None,
+    progress: Callable = None
+) -> dict:
+    """
+    generates the examples of a task, streams them to the tasks folder and returns the task statistics
+
+    the generator draws from a random number generator seeded for the task, such that the examples
+    do not depend on which tasks were generated before or in which thread or process; progress is
+    called with the number of examples after each new example
+
+    the random number generator state, the identifiers of the examples seen and the statistics are
+    checkpointed with the task file offset at most every checkpoint_interval seconds, and a task
+    with a checkpoint continues from it, generating the same examples as an uninterrupted run; the
+    final checkpoint of a task holds its statistics, such that a finished task is not generated again
+
+    each attempt that is rejected is counted and timed by its reason: the generator failing or not
+    returning grids, the verifier failing or disagreeing, the input equalling the output, or the
+    input having been generated before; the task stops early, with fewer than n_examples examples,
+    once it made max_attempts attempts or spent max_seconds seconds, recorded as budget_exhausted
+
+    verification 'always' verifies every example; 'sampled' verifies every example until
+    verification_warmup examples verified without a single mismatch, and afterwards a
+    verification_fraction of them, with the examples written unverified counted as n_unverified;
+    the first sampled mismatch verifies the examples written unverified before it, and the task
+    file is rewound to drop those that fail, such that they are replaced by newly generated ones,
+    every later example being verified;
+    'deferred' verifies the examples in the verifier_pool while generating more, in batches of up to
+    verification_batch examples, and only writes an example once it verified, such that examples
+    failing verification are replaced by newly generated ones and the task equals the 'always' one
+
+    with an example_timeout, the generator runs in the worker process of the generator_supervisor,
+    which is replaced when an example is not generated within example_timeout seconds; such an
+    attempt is rejected as a timeout and logged with the random number generator state it started
+    from to the timeouts folder, see replay_example, and the random number generator is reseeded
+    from the task seed and the attempt
+    """
+    if verification not in VERIFICATION_POLICIES:
+        raise ValueError(f'unknown verification policy {verification}')
+    if verification == 'deferred' and verifier_pool is None:
+        raise ValueError('deferred verification requires a verifier pool')
+    if example_timeout is not None and generator_supervisor is None:
+        raise ValueError('an example timeout requires a generator supervisor')
+    generator, verifier = mappers[0][key], mappers[1][key]
+    writer_class = writers.WRITERS[task_format]
+    task_path = os.path.join(path, 'tasks', f'{key}{writer_class.extension}')
+    checkpoint_path = os.path.join(path, 'checkpoints', f'{key}.json')
+    rng = curried_random.Random(task_seed(seed, key))
+    if use_memo:
+        memo.MEMO.reset_stats()
+    checkpoint = writers.load_checkpoint(checkpoint_path)
+    if checkpoint is not None and checkpoint['done']:
+        return checkpoint['stats']
+    if checkpoint is None:
+        seen = set()
+        stats = {
+            'n_generations': 0, 'n_verified': 0, 'n_nondegenerate': 0,
+            'rng_difficulties': [], 'runtime': 0, 'n_attempts': 0,
+            'rejections': {reason: {'count': 0, 'time': 0} for reason in REJECTION_REASONS},
+            'budget_exhausted': None, 'n_unverified': 0
+        }
+        writer = writer_class(task_path)
+        window = None
+    else:
+        version, state, gauss_next = checkpoint['rng']
+        rng.setstate((version, tuple(state), gauss_next))
+        seen = set(checkpoint['seen'])
+        stats = checkpoint['stats']
+        writer = writer_class(task_path, checkpoint['offset'], checkpoint['count'])
+        window = checkpoint.get('window')
+
+    def reject(reason, seconds):
+        rejection = stats['rejections'][reason]
+        rejection['count'] += 1
+        rejection['time'] += seconds
+
+    def invalidate():
+        """
+        verifies the examples written unverified, read back from the task file, and rewrites the task file
+        without those failing
+        """
+        nonlocal writer, window
+        offset, count = writer.tell(), writer.count
+        writer.close()
+        examples = writers.load_examples(task_path, window['count'])
+        failed = set()
+        for i in window['unverified']:
+            stats['n_unverified'] -= 1
+            verified, verification_seconds = verify_example(verifier, format_example(examples[i]))
+            if verified:
+                stats['n_verified'] += 1
+            else:
+                failed.add(i)
+                stats['n_nondegenerate'] -= 1
+                reject('verification', verification_seconds)
+        if failed:
+            n = len(examples)
+            difficulties = stats['rng_difficulties'][-n:]
+            del stats['rng_difficulties'][-n:]
+            writer = writer_class(task_path, window['offset'], window['count'])
+            for i, example in enumerate(examples):
+                if i in failed:
+                    seen.discard(hash(format_example(example)['input']))
+                else:
+                    writer.write(example)
+                    stats['rng_difficulties'].append(difficulties[i])
+        else:
+            writer = writer_class(task_path, offset, count)
+        window = None
+
+    def settle(example, identifier, difficulties, seconds, verified):
+        """ writes or rejects a generated example, verified being None if it was not verified """
+        nonlocal window
+        if verified is False:
+            reject('verification', seconds)
+            return invalidate() if window is not None else None
+        if verified:
+            stats['n_verified'] += 1
+        if example['input'] == example['output']:
+            return reject('degenerate', seconds)
+        stats['n_nondegenerate'] += 1
+        if identifier in seen:
+            return reject('duplicate', seconds)
+        if verified is None:
+            stats['n_unverified'] += 1
+            if window is None:
+                window = {'offset': writer.tell(), 'count': writer.count, 'unverified': []}
+            window['unverified'].append(writer.count - window['count'])
+        writer.write(example)
+        seen.add(identifier)
+        stats['rng_difficulties'].append(get_rng_difficulty(difficulties))
+        if progress is not None:
+            progress(writer.count)
+
+    pending = []
+    start = last_checkpoint = time.time()
+    while writer.count < n_examples:
+        attempt_start = time.time()
+        if max_attempts is not None and stats['n_attempts'] >= max_attempts:
+            stats['budget_exhausted'] = 'attempts'
+        elif max_seconds is not None and stats['runtime'] + attempt_start - start >= max_seconds:
+            stats['budget_exhausted'] = 'time'
+        else:
+            stats['n_attempts'] += 1
+            try:
+                if example_timeout is None:
+                    with curried_random.using(rng), recording() as difficulties:
+                        example = generator(diff_lb, diff_ub)
+                else:
+                    state = rng.getstate()
+                    example, difficulties, state = generator_supervisor.call(
+                        example_timeout, generate_worker_example, key, state, diff_lb, diff_ub
+                    )
+                    rng.setstate(state)
+                assert is_grid(example['input'])
+                assert is_grid(example['output'])
+                identifier = hash(example['input'])
+                stats['n_generations'] += 1
+            except supervisor.DeadlineExceeded:
+                log_timeout(path, key, stats['n_attempts'], state, diff_lb, diff_ub, example_timeout)
+                rng.seed(task_seed(seed, f'{key}/{stats["n_attempts"]}'))
+                reject('timeout', time.time() - attempt_start)
+                continue
+            except Exception:
+                reject('generation', time.time() - attempt_start)
+                continue
+            seconds = time.time() - attempt_start
+            if verification == 'deferred':
+                future = verifier_pool.submit(verify_worker_example, key, example)
+                pending.append((example, identifier, difficulties, seconds, future))
+                if len(pending) < min(verification_batch, n_examples - writer.count):
+                    continue
+            else:
+                verify = verification == 'always' or stats['n_verified'] < verification_warmup
+                verify = verify or stats['rejections']['verification']['count'] > 0
+                verify = verify or task_seed(seed, f'{key}/{stats["n_attempts"]}') < verification_fraction * 2 ** 64
+                if verify:
+                    verified, verification_seconds = verify_example(verifier, example)
+                    settle(example, identifier, difficulties, seconds + verification_seconds, verified)
+                else:
+                    settle(example, identifier, difficulties, seconds, None)
+        for example, identifier, difficulties, seconds, future in pending:
+            verified, verification_seconds = future.result()
+            settle(example, identifier, difficulties, seconds + verification_seconds, verified)
+        pending = []
+        if stats['budget_exhausted'] is not None:
+            break
+        now = time.time()
+        if now - last_checkpoint >= checkpoint_interval and writer.count < n_examples:
+            writers.save_checkpoint(checkpoint_path, {
+                'done': False, 'count': writer.count, 'offset': writer.tell(), 'rng': rng.getstate(),
+                'seen': list(seen), 'window': window,
+                'stats': {**stats, 'runtime': stats['runtime'] + now - start}
+            })
+            last_checkpoint = now
+    end = time.time()
+    stats['runtime'] += end - start
+    if use_memo:
+        stats['memo'] = memo.MEMO.stats()
+    writer.close()
+    writers.save_checkpoint(checkpoint_path, {'done': True, 'stats': stats})
+    return stats
+
+
+def log_timeout(
+    path: str,
+    key: str,
+    attempt: int,
+    state: tuple,
+    diff_lb: float,
+    diff_ub: float,
+    timeout: float
+) -> None:
+    """
+    appends a timed-out attempt to the timeouts log of its task
+    """
+    entry = {
+        'key': key, 'attempt': attempt, 'rng': state, 'diff_lb': diff_lb, 'diff_ub': diff_ub, 'timeout': timeout
+    }
+    with open(os.path.join(path, 'timeouts', f'{key}.jsonl'), 'a') as fp:
+        fp.write(json.dumps(entry) + '\n')
+
+
+def replay_example(
+    entry: dict
+) -> dict:
+    """
+    reruns the generator of a logged attempt from the random number generator state it started from
+    """
+    version, state, gauss_next = entry['rng']
+    rng = curried_random.Random()
+    rng.setstate((version, tuple(state), gauss_next))
+    with curried_random.using(rng):
+        return get_generators()[entry['key']](entry['diff_lb'], entry['diff_ub'])
+
+
+worker_mappers = None
+
+worker_layers = None
+
+worker_n_verifiers = 0
+
+worker_supervised = False
+
+
+def init_worker(
+    layers: dict,
+    n_verifiers: int = 0,
+    supervised: bool = False
+) -> None:
+    """
+    builds the generators and verifiers mappers of a worker process
+    """
+    global worker_mappers, worker_layers, worker_n_verifiers, worker_supervised
+    worker_mappers = get_mappers(**layers)
+    worker_layers, worker_n_verifiers, worker_supervised = layers, n_verifiers, supervised
+
+
+def get_verifier_pool(
+    layers: dict,
+    n_verifiers: int
+) -> Executor:
+    """
+    returns a pool of processes verifying examples with the verifiers of the given layers
+    """
+    return ProcessPoolExecutor(n_verifiers, initializer=init_worker, initargs=(layers,))
+
+
+def get_generator_supervisor(
+    layers: dict
+) -> supervisor.Supervisor:
+    """
+    returns a supervisor running the generators of the given layers in a worker process
+    """
+    return supervisor.Supervisor(initializer=init_worker, initargs=(layers,))
+
+
+def verify_worker_example(
+    key: str,
+    example: dict
+) -> tuple:
+    """
+    verifies an example of a task in a worker process
+    """
+    return verify_example(worker_mappers[1][key], example)
+
+
+def generate_worker_example(
+    key: str,
+    state: tuple,
+    diff_lb: float,
+    diff_ub: float
+) -> tuple:
+    """
+    generates an example of a task in a worker process from a random number generator state, returns
+    the example (None if the generator failed), the sampled difficulties and the state afterwards
+    """
+    rng = curried_random.Random()
+    rng.setstate(state)
+    example = None
+    try:
+        with curried_random.using(rng), recording() as difficulties:
+            example = worker_mappers[0][key](diff_lb, diff_ub)
+    except Exception:
+        pass
+    return example, difficulties, rng.getstate()
+
+
+def generate_worker_task(
+    key: str,
+    options: dict
+) -> tuple:
+    """
+    generates a task in a worker process with the keyword arguments of generate_task in options, returns the
+    task key and statistics
+    """
+    with ExitStack() as stack:
+        verifier_pool, generator_supervisor = None, None
+        if worker_n_verifiers:
+            verifier_pool = stack.enter_context(get_verifier_pool(worker_layers, worker_n_verifiers))
+        if worker_supervised:
+            generator_supervisor = stack.enter_context(get_generator_supervisor(worker_layers))
+        stats = generate_task(
+            key, worker_mappers, **options, verifier_pool=verifier_pool, generator_supervisor=generator_supervisor
+        )
+    return key, stats
+
+
+def get_summary(
+    metadata: dict,
+    n_examples: int
+) -> dict:
+    """
+    returns the tasks that stopped early at their budget and the rejections summed over all tasks
+    """
+    rejections = {reason: {'count': 0, 'time': 0} for reason in REJECTION_REASONS}
+    budget_exhausted = dict()
+    for key, stats in metadata.items():
+        for reason, rejection in stats['rejections'].items():
+            rejections[reason]['count'] += rejection['count']
+            rejections[reason]['time'] += rejection['time']
+        if stats['budget_exhausted'] is not None:
+            budget_exhausted[key] = {
+                'budget': stats['budget_exhausted'], 'n_examples': len(stats['rng_difficulties']),
+                'n_attempts': stats['n_attempts'], 'runtime': stats['runtime']
+            }
+    return {
+        'n_tasks': len(metadata), 'n_examples': n_examples,
+        'rejections': rejections, 'budget_exhausted': budget_exhausted
+    }
+
+
 def generate_dataset(
     path: str = 're_arc',
     seed: int = 42,
     n_examples: int = 1000,
     diff_lb: float = 0,
-    diff_ub: float = 1
+    diff_ub: float = 1,
+    use_grid_builder: bool = False,
+    use_memo: bool = False,
+    n_workers: int = 1,
+    task_format: str = 'json',
+    checkpoint_interval: float = 60,
+    resume: bool = False,
+    max_attempts: int = None,
+    max_seconds: float = None,
+    verification: str = 'always',
+    verification_warmup: int = 100,
+    verification_fraction: float = 0.1,
+    verification_batch: int = 64,
+    n_verifiers: int = 1,
+    example_timeout: float = None,
+    score: bool = True
 ) -> None:
     """
     generates dataset
 
     path: which folder to save data to
-    seed: for deterministic generation / reproducibility
+    seed: for deterministic generation / reproducibility, each task is seeded from the seed and its key
     n_examples: number of examples per task
     diff_lb: lower bound for difficulty
     diff_ub: upper bound for difficulty
+    use_grid_builder: whether to coalesce grid edits with the grid builder
+    use_memo: whether to memoize expensive primitives, recording hit statistics per task
+    n_workers: number of processes the tasks are sharded across, the generated tasks do not depend on it
+    task_format: format of the task files, 'json' (a list of examples), 'jsonl' (an example per line) or 'packed'
+    checkpoint_interval: minimal number of seconds between two checkpoints of an unfinished task
+    resume: whether to continue an interrupted run in the folder from its last checkpoints, which requires the
+        same settings of what the tasks hold: seed, n_examples, difficulties, task_format, budgets and verification
+    max_attempts: number of generation attempts after which a task stops early, unbounded if None
+    max_seconds: number of seconds after which a task stops early, unbounded if None
+    verification: verification policy, 'always', 'sampled' or 'deferred' (see generate_task)
+    verification_warmup: number of examples verified for each task before sampling verifications
+    verification_fraction: fraction of the examples verified after the warm-up
+    verification_batch: maximal number of examples verified at once with deferred verification
+    n_verifiers: number of verifier processes (per worker) with deferred verification
+    example_timeout: number of seconds after which an example is rejected and its generator process replaced,
+        unbounded if None, generators then run in a supervised process (per worker) whose memo hits are not recorded
+    score: whether to score the difficulty of the examples after generating them, in n_workers processes,
+        also adding the pso_difficulties of each task to the metadata
     """
-    set_seed(seed)
-    os.makedirs(path)
-    tasks_path = os.path.join(path, 'tasks')
-    os.makedirs(tasks_path)
-    generators_mapper = get_generators()
-    verifiers_mapper = get_verifiers()
-    keys = sorted(generators_mapper.keys())
+    layers = {'use_grid_builder': use_grid_builder, 'use_memo': use_memo}
+    # the settings the tasks depend on, checked on resume and passed on to generate_task
+    config = {
+        'seed': seed, 'n_examples': n_examples, 'diff_lb': diff_lb, 'diff_ub': diff_ub,
+        'task_format': task_format, 'max_attempts': max_attempts, 'max_seconds': max_seconds,
+        'example_timeout': example_timeout, 'verification': verification,
+        'verification_warmup': verification_warmup, 'verification_fraction': verification_fraction,
+        'verification_batch': verification_batch
+    }
+    if task_format not in writers.WRITERS:
+        raise ValueError(f'unknown task format {task_format}')
+    if verification not in VERIFICATION_POLICIES:
+        raise ValueError(f'unknown verification policy {verification}')
+    manifest_path = os.path.join(path, 'manifest.json')
+    manifest = writers.load_checkpoint(manifest_path) if resume else None
+    if manifest is None:
+        manifest = {'config': config, 'completed': []}
+    elif manifest['config'] != config:
+        raise ValueError(f'can not resume {path}, it was generated with {manifest["config"]}')
+    mappers = get_mappers(**layers)
+    os.makedirs(path, exist_ok=resume)
+    os.makedirs(os.path.join(path, 'tasks'), exist_ok=resume)
+    os.makedirs(os.path.join(path, 'checkpoints'), exist_ok=resume)
+    os.makedirs(os.path.join(path, 'timeouts'), exist_ok=resume)
+    writers.save_checkpoint(manifest_path, manifest)
+    completed = manifest['completed']
+    keys = sorted(mappers[0].keys())
+    pending = [key for key in keys if key not in completed]
     k = len(keys)
-    desc = f'task 0/{k}, example 0/{n_examples}'
-    pbar = tqdm.tqdm(enumerate(keys), desc=desc, position=0, leave=True, total=k)
-    metadata = dict()
-    for i, key in pbar:
-        generator = generators_mapper[key]
-        verifier = verifiers_mapper[key]
-        seen = set()
-        examples = []
-        stats = {
-            'n_generations': 0, 'n_verified': 0, 'n_nondegenerate': 0,
-            'rng_difficulties': [], 'pso_difficulties': []
-        }
-        start = time.time()
-        while len(examples) < n_examples:
-            example, identifier, success = None, None, True
-            try:
-                example = generator(diff_lb, diff_ub)
-                assert is_grid(example['input'])
-                assert is_grid(example['output'])
-                identifier = hash(example['input'])
-                stats['n_generations'] += 1
-            except:
-                success = False
-            try:
-                assert success and verifier(example['input']) == example['output']
-                stats['n_verified'] += 1
-            except:
-                success = False
-            try:
-                assert success and example['input'] != example['output']
-                stats['n_nondegenerate'] += 1
-            except:
-                success = False
-            if success and identifier not in seen:
-                examples.append(example)
-                seen.add(identifier)
-                stats['rng_difficulties'].append(get_rng_difficulty(example))
-                stats['pso_difficulties'].append(get_pso_difficulty(example))
-                desc = f'task {i+1}/{k}, example {len(examples)}/{n_examples}'
-                pbar.set_description(desc)
-        end = time.time()
-        stats['runtime'] = end - start
-        with open(os.path.join(tasks_path, f'{key}.json'), 'w') as fp:
-            json.dump(examples, fp)
-        metadata[key] = stats
+    options = dict(config, path=path, use_memo=use_memo, checkpoint_interval=checkpoint_interval)
+    n_verifiers = n_verifiers if verification == 'deferred' else 0
+    if n_workers > 1:
+        pbar = tqdm.tqdm(desc='tasks', position=0, leave=True, total=k, initial=k - len(pending))
+        initargs = (layers, n_verifiers, example_timeout is not None)
+        with ProcessPoolExecutor(n_workers, initializer=init_worker, initargs=initargs) as executor:
+            futures = [executor.submit(generate_worker_task, key, options) for key in pending]
+            for future in as_completed(futures):
+                key, _ = future.result()
+                completed.append(key)
+                writers.save_checkpoint(manifest_path, manifest)
+                pbar.update(1)
+        pbar.close()
+    else:
+        verifier_pool = get_verifier_pool(layers, n_verifiers) if n_verifiers else None
+        generator_supervisor = get_generator_supervisor(layers) if example_timeout is not None else None
+        desc = f'task {k - len(pending)}/{k}, example 0/{n_examples}'
+        pbar = tqdm.tqdm(pending, desc=desc, position=0, leave=True, total=k, initial=k - len(pending))
+        for i, key in enumerate(pbar, start=k - len(pending)):
+            progress = lambda n, i=i: pbar.set_description(f'task {i+1}/{k}, example {n}/{n_examples}')
+            generate_task(
+                key, mappers, **options, verifier_pool=verifier_pool, generator_supervisor=generator_supervisor,
+                progress=progress
+            )
+            completed.append(key)
+            writers.save_checkpoint(manifest_path, manifest)
+        if verifier_pool is not None:
+            verifier_pool.shutdown()
+        if generator_supervisor is not None:
+            generator_supervisor.stop()
+    metadata = {
+        key: writers.load_checkpoint(os.path.join(path, 'checkpoints', f'{key}.json'))['stats'] for key in keys
+    }
     with open(os.path.join(path, 'metadata.json'), 'w') as fp:
         json.dump(metadata, fp)
+    summary = get_summary(metadata, n_examples)
+    with open(os.path.join(path, 'summary.json'), 'w') as fp:
+        json.dump(summary, fp)
+    if summary['budget_exhausted']:
+        print(f'{len(summary["budget_exhausted"])} tasks stopped early: {sorted(summary["budget_exhausted"])}')
+    if score:
+        scoring.score_dataset(path, n_workers=n_workers)
 
 
 def demo_dataset(
@@ -152,20 +603,18 @@ def demo_dataset(
     e: int = 400
 ) -> None:
     """
-    visualizing snippets from a generated dataset (original, easy, medium and hard instances for each task)
+    visualizing snippets from a generated dataset (original, easy, medium and hard instances for each task),
+    ordered by the PSO difficulty, which is computed for unscored datasets
     """
-    with open(f'{folder}/metadata.json', 'r') as fp:
-        metadata = json.load(fp)
     for i, fn in enumerate(sorted(os.listdir(f'{folder}/tasks'))):
         if s <= i < e:
             key = fn[:8]
             with open(f'arc_original/training/{key}.json', 'r') as fp:
                 original_task = json.load(fp)
-            with open(f'{folder}/tasks/{key}.json', 'r') as fp:
-                generated_task = json.load(fp)
+            generated_task = writers.load_task(f'{folder}/tasks/{fn}')
             original_task = [format_example(example) for example in original_task['train'] + original_task['test']]
             generated_task = [format_example(example) for example in generated_task[:10*n]]
-            difficulties = metadata[key]['pso_difficulties'][:9*n]
+            difficulties = scoring.load_task_scores(folder, key, 'pso')[:9*n]
             generated_task = [ex for ex, diff in sorted(zip(generated_task, difficulties), key=lambda item: item[1])]
             easy = generated_task[1*n:2*n]
             hard = generated_task[8*n:9*n]
@@ -0,0 +1,143 @@
+"""
+    Contains an optional memoization layer for the expensive pure primitives of the re-arc DSL.
+
+    Calls on grids are kept in a bounded LRU cache keyed by the primitive, a content hash of the
+    grid and the remaining arguments. The content hash is computed once per grid object, and a
+    hit is confirmed by comparing the arguments, which is immediate for the same grid object;
+    equal grids built separately still hit after one comparison. Calls on patches are cheap
+    enough to not be cached. Hit and miss counts are recorded per primitive.
+
+    Memoization is enabled per generator or verifier through `boundary`, which installs the
+    memoized primitives for the duration of the call. The primitives are memoized as bound when
+    the call starts, so memoization composes with the grid builder layer.
+"""
+
+import functools
+import inspect
+from collections import OrderedDict
+
+import currying
+import dsl
+from dsl import *
+
+import utils
+
+
+PRIMITIVES = (
+    'objects',
+    'partition',
+    'fgpartition',
+    'mostcolor',
+    'palette',
+    'occurrences',
+    'frontiers',
+)
+
+
+class Memo:
+    """ bounded LRU cache shared by memoized primitives, with hit and miss counts per primitive """
+
+    def __init__(
+        self,
+        maxsize: int = 4096
+    ):
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.hashes = dict()
+        self.hits = dict()
+        self.misses = dict()
+
+    def fingerprint(
+        self,
+        grid: Grid
+    ) -> int:
+        """ content hash of a grid, computed once per grid object """
+        entry = self.hashes.get(id(grid))
+        if entry is not None and entry[0] is grid:
+            return entry[1]
+        if len(self.hashes) >= self.maxsize:
+            self.hashes.clear()
+        h = hash(grid)
+        self.hashes[id(grid)] = (grid, h)
+        return h
+
+    def memoize(
+        self,
+        name: str,
+        func: Callable
+    ) -> Callable:
+        """ memoized version of a (curried) primitive, caching calls on grids """
+        n = currying.arity(func)
+        cache = self.cache
+        self.hits.setdefault(name, 0)
+        self.misses.setdefault(name, 0)
+
+        @functools.wraps(func)
+        def memoized(*args):
+            if len(args) != n:
+                return functools.partial(memoized, *args)
+            if not hasattr(type(args[0]), '__getitem__'):
+                return func(*args)
+            try:
+                key = hash((name, self.fingerprint(args[0]), args[1:]))
+            except TypeError:
+                return func(*args)
+            entry = cache.get(key)
+            if entry is not None and entry[0] == args:
+                self.hits[name] += 1
+                cache.move_to_end(key)
+                return entry[1]
+            self.misses[name] += 1
+            value = func(*args)
+            cache[key] = (args, value)
+            cache.move_to_end(key)
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+            return value
+        memoized.arity = n
+        return memoized
+
+    def stats(self) -> dict:
+        """ hits, misses and hit rate per primitive """
+        return {
+            name: {
+                'hits': self.hits[name],
+                'misses': self.misses[name],
+                'hit_rate': self.hits[name] / max(1, self.hits[name] + self.misses[name])
+            } for name in self.hits
+        }
+
+    def reset_stats(self) -> None:
+        """ sets all hit and miss counts to zero """
+        for name in self.hits:
+            self.hits[name] = 0
+            self.misses[name] = 0
+
+    def clear(self) -> None:
+        """ empties the cache and resets the statistics """
+        self.cache.clear()
+        self.hashes.clear()
+        self.reset_stats()
+
+
+MEMO = Memo()
+
+
+def boundary(
+    func: Callable,
+    memo: Memo = MEMO
+) -> Callable:
+    """ runs a generator or verifier with memoized primitives """
+    namespace = inspect.unwrap(func).__globals__
+    names = [name for name in PRIMITIVES if namespace.get(name) is getattr(dsl, name)]
+    wrappers = dict()
+
+    def primitives(namespace):
+        memoized = dict()
+        for name in names:
+            key = (name, namespace[name])
+            if key not in wrappers:
+                wrappers[key] = memo.memoize(name, namespace[name])
+            memoized[name] = wrappers[key]
+        return memoized
+    return utils.layered(func, primitives)
@@ -0,0 +1,487 @@
+"""
+    Contains a microbenchmark suite for the primitives of the re-arc DSL and the curried utils.
+
+    Every exported DSL primitive and every curried helper of the utils is called on seeded
+    random grids, objects and indices for each of the grid sizes in SIZES, recording the time
+    per call and the memory allocated by a call. The report is written as JSON and can be
+    compared against the report of a baseline run on the same machine, failing when any
+    primitive got slower or allocates more than a threshold allows. Timings are compared relative
+    to a fixed calibration workload timed around each measurement, which absorbs changes in the
+    speed of the machine during and between runs, and apparent regressions are measured again
+    before they are reported. The baseline report of the repository is BASELINE, recorded with the
+    Python version of environment.yml, which --check compares against unless another --baseline is
+    given; the check fails if the baseline is missing or was recorded with another Python version or
+    on another platform, unless --ignore-environment is given:
+
+        python microbenchmarks.py --check
+        python microbenchmarks.py --output report.json --baseline baseline.json --threshold 1.5
+
+    After an intended change of performance, or to check on another machine, the baseline is rewritten
+    from the median of several runs, as some timings alternate between runs:
+
+        python microbenchmarks.py --runs 5 --output microbenchmarks_baseline.json
+"""
+
+import argparse
+import inspect
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+import tracemalloc
+
+import dsl
+from dsl import *
+
+import curried_random
+import utils
+from benchmarks import random_grid
+
+
+SIZES = (3, 10, 20, 30)
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'microbenchmarks_baseline.json')
+
+
+CASES = {
+    'identity': ('obj',),
+    'add': ('loc', 'vector'),
+    'subtract': ('loc', 'vector'),
+    'multiply': ('loc', 'number'),
+    'divide': ('loc', 'factor'),
+    'invert': ('loc',),
+    'even': ('number',),
+    'double': ('loc',),
+    'halve': ('loc',),
+    'flip': ('true',),
+    'equality': ('grid', 'other'),
+    'contained': ('loc', 'indices'),
+    'combine': ('indices', 'indices2'),
+    'intersection': ('indices', 'indices2'),
+    'difference': ('indices', 'indices2'),
+    'dedupe': ('values',),
+    'order': ('objs', 'measure'),
+    'repeat': ('obj', 'factor'),
+    'greater': ('number', 'factor'),
+    'size': ('indices',),
+    'merge': ('objs',),
+    'maximum': ('integers',),
+    'minimum': ('integers',),
+    'valmax': ('objs', 'measure'),
+    'valmin': ('objs', 'measure'),
+    'argmax': ('objs', 'measure'),
+    'argmin': ('objs', 'measure'),
+    'mostcommon': ('values',),
+    'leastcommon': ('values',),
+    'initset': ('loc',),
+    'both': ('true', 'false'),
+    'either': ('true', 'false'),
+    'increment': ('loc',),
+    'decrement': ('loc',),
+    'crement': ('vector',),
+    'sign': ('vector',),
+    'positive': ('number',),
+    'toivec': ('number',),
+    'tojvec': ('number',),
+    'sfilter': ('objs', 'predicate'),
+    'mfilter': ('objs', 'predicate'),
+    'extract': ('objs', 'predicate'),
+    'totuple': ('indices',),
+    'first': ('objs',),
+    'last': ('objs',),
+    'insert': ('loc', 'indices'),
+    'remove': ('loc', 'indices'),
+    'other': ('sequence', 'zero'),
+    'interval': ('zero', 'dim', 'one'),
+    'astuple': ('number', 'factor'),
+    'product': ('integers', 'integers'),
+    'pair': ('sequence', 'sequence2'),
+    'branch': ('true', 'grid', 'other'),
+    'compose': ('measure', 'mapper'),
+    'chain': ('measure', 'mapper', 'mapper'),
+    'matcher': ('measure', 'number'),
+    'rbind': ('binary', 'number'),
+    'lbind': ('binary', 'number'),
+    'power': ('unary', 'factor'),
+    'fork': ('binary', 'measure', 'measure'),
+    'apply': ('measure', 'objs'),
+    'rapply': ('functions', 'obj'),
+    'mapply': ('mapper', 'objs'),
+    'papply': ('binary', 'sequence', 'sequence2'),
+    'mpapply': ('pairing', 'sequence', 'sequence2'),
+    'prapply': ('binary', 'integers', 'integers'),
+    'mostcolor': ('grid',),
+    'leastcolor': ('grid',),
+    'height': ('obj',),
+    'width': ('obj',),
+    'shape': ('obj',),
+    'portrait': ('obj',),
+    'colorcount': ('grid', 'color'),
+    'colorfilter': ('objs', 'color'),
+    'sizefilter': ('objs', 'one'),
+    'asindices': ('grid',),
+    'ofcolor': ('grid', 'color'),
+    'ulcorner': ('obj',),
+    'urcorner': ('obj',),
+    'llcorner': ('obj',),
+    'lrcorner': ('obj',),
+    'crop': ('grid', 'loc', 'dims'),
+    'toindices': ('obj',),
+    'recolor': ('color', 'obj'),
+    'shift': ('obj', 'vector'),
+    'normalize': ('obj',),
+    'dneighbors': ('loc',),
+    'ineighbors': ('loc',),
+    'neighbors': ('loc',),
+    'objects': ('grid', 'true', 'false', 'true'),
+    'partition': ('grid',),
+    'fgpartition': ('grid',),
+    'uppermost': ('obj',),
+    'lowermost': ('obj',),
+    'leftmost': ('obj',),
+    'rightmost': ('obj',),
+    'square': ('obj',),
+    'vline': ('obj',),
+    'hline': ('obj',),
+    'hmatching': ('obj', 'obj2'),
+    'vmatching': ('obj', 'obj2'),
+    'manhattan': ('obj', 'obj2'),
+    'adjacent': ('obj', 'obj2'),
+    'bordering': ('obj', 'grid'),
+    'centerofmass': ('obj',),
+    'palette': ('grid',),
+    'numcolors': ('grid',),
+    'color': ('obj',),
+    'toobject': ('indices', 'grid'),
+    'asobject': ('grid',),
+    'rot90': ('grid',),
+    'rot180': ('grid',),
+    'rot270': ('grid',),
+    'hmirror': ('grid',),
+    'vmirror': ('grid',),
+    'dmirror': ('grid',),
+    'cmirror': ('grid',),
+    'fill': ('grid', 'color', 'indices'),
+    'paint': ('grid', 'obj'),
+    'underfill': ('grid', 'color', 'indices'),
+    'underpaint': ('grid', 'obj'),
+    'hupscale': ('grid', 'factor'),
+    'vupscale': ('grid', 'factor'),
+    'upscale': ('grid', 'factor'),
+    'downscale': ('grid', 'factor'),
+    'hconcat': ('grid', 'other'),
+    'vconcat': ('grid', 'other'),
+    'subgrid': ('obj', 'grid'),
+    'hsplit': ('grid', 'factor'),
+    'vsplit': ('grid', 'factor'),
+    'cellwise': ('grid', 'other', 'zero'),
+    'replace': ('grid', 'color', 'color2'),
+    'switch': ('grid', 'color', 'color2'),
+    'center': ('obj',),
+    'position': ('obj', 'obj2'),
+    'index': ('grid', 'loc'),
+    'canvas': ('zero', 'shape'),
+    'corners': ('obj',),
+    'connect': ('loc', 'loc2'),
+    'cover': ('grid', 'obj'),
+    'trim': ('grid',),
+    'move': ('grid', 'obj', 'vector'),
+    'tophalf': ('grid',),
+    'bottomhalf': ('grid',),
+    'lefthalf': ('grid',),
+    'righthalf': ('grid',),
+    'vfrontier': ('loc',),
+    'hfrontier': ('loc',),
+    'backdrop': ('obj',),
+    'delta': ('obj',),
+    'gravitate': ('obj', 'obj2'),
+    'inbox': ('obj',),
+    'outbox': ('obj',),
+    'box': ('obj',),
+    'shoot': ('loc', 'direction'),
+    'occurrences': ('grid', 'obj2'),
+    'batchoccurrences': ('grid', 'objs'),
+    'frontiers': ('grid',),
+    'compress': ('grid',),
+    'hperiod': ('cells',),
+    'vperiod': ('cells',),
+    'period2d': ('cells',),
+}
+
+
+UTILS_CASES = {
+    'add': ('number', 'factor'),
+    'sub': ('number', 'factor'),
+    'div': ('number', 'factor'),
+    'floordiv': ('number', 'factor'),
+    'eq': ('number', 'factor'),
+    'neq': ('number', 'factor'),
+    'gt': ('number', 'factor'),
+    'gte': ('number', 'factor'),
+    'lt': ('number', 'factor'),
+    'lte': ('number', 'factor'),
+    'unifint': ('zero', 'one', 'bounds'),
+    'is_grid': ('grid',),
+    'strip_prefix': ('name', 'prefix'),
+    'format_grid': ('rows',),
+    'format_example': ('example',),
+    'format_task': ('task',),
+}
+
+
+def fixtures(
+    dim: Integer,
+    seed: Integer
+) -> dict:
+    """ seeded random arguments for a grid size """
+    rng = random.Random(seed * 31 + dim)
+    grid, other = random_grid(dim, dim, 4, rng), random_grid(dim, dim, 4, rng)
+    objs = objects(grid, T, F, T)
+    obj, obj2 = argmax(objs, size), argmin(objs, size)
+    rows = [list(row) for row in grid]
+    example = {'input': rows, 'output': [list(row) for row in other]}
+    return {
+        'grid': grid,
+        'other': other,
+        'objs': objs,
+        'obj': obj,
+        'obj2': obj2,
+        'cells': asobject(grid),
+        'indices': toindices(obj),
+        'indices2': toindices(obj2) | ofcolor(grid, 2),
+        'loc': (dim // 2, dim // 2),
+        'loc2': (dim - 1, 0),
+        'vector': (1, -1),
+        'direction': (1, 1),
+        'dims': (max(1, dim // 2), max(1, dim // 2)),
+        'shape': (dim, dim),
+        'bounds': (1, dim),
+        'color': 1,
+        'color2': 2,
+        'number': 3,
+        'factor': 2,
+        'dim': dim,
+        'zero': 0,
+        'one': 1,
+        'true': T,
+        'false': F,
+        'values': tuple(v for row in grid for v in row),
+        'integers': frozenset(range(dim)),
+        'sequence': tuple(range(dim)),
+        'sequence2': tuple(range(dim, 0, -1)),
+        'measure': size,
+        'mapper': toindices,
+        'unary': increment,
+        'binary': add,
+        'pairing': astuple,
+        'predicate': compose(positive, size),
+        'functions': (height, width, size),
+        'rows': rows,
+        'example': example,
+        'task': {'train': [example] * 3, 'test': [example]},
+        'name': 'generate_' + '0' * dim,
+        'prefix': 'generate_',
+    }
+
+
+def exported() -> List:
+    """ names of the primitives exported by the DSL """
+    return [
+        name for name, func in vars(dsl).items()
+        if inspect.isfunction(func) and func.__module__ == 'dsl' and not name.startswith('_')
+    ]
+
+
+def measure(
+    func: Callable,
+    args: Tuple,
+    budget: float,
+    repeat: Integer
+) -> dict:
+    """ best time per call over repeated timings of about budget seconds, and bytes allocated by one call """
+    timer = timeit.Timer(lambda: func(*args))
+    single = max(timer.timeit(1), 1e-7)
+    number = max(1, int(budget / single))
+    ns = min(timer.repeat(repeat, number)) / number * 1e9
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    func(*args)
+    allocated = tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return {'ns': round(ns, 1), 'bytes': allocated}
+
+
+def calibration(
+    repeat: Integer = 3
+) -> float:
+    """ best time in nanoseconds of a fixed pure python workload, measuring the current speed of the machine """
+    def workload():
+        cells = {(i, j) for i in range(30) for j in range(30)}
+        return tuple(tuple(int((i, j) in cells) for j in range(30)) for i in range(30))
+    return min(timeit.Timer(workload).repeat(repeat, 5)) / 5 * 1e9
+
+
+def run(
+    sizes: Tuple = SIZES,
+    seed: Integer = 0,
+    budget: float = 0.002,
+    repeat: Integer = 7,
+    only: Container = None
+) -> dict:
+    """ benchmarks all primitives for all grid sizes, returning the report """
+    missing = set(exported()) - set(CASES)
+    if len(missing) > 0:
+        raise ValueError(f'no benchmark case for DSL primitives {sorted(missing)}')
+    cases = [('dsl', name, getattr(dsl, name), keys) for name, keys in CASES.items()]
+    cases += [('utils', name, getattr(utils, name), keys) for name, keys in UTILS_CASES.items()]
+    arguments = {dim: fixtures(dim, seed) for dim in sizes}
+    results = dict()
+    for module, name, func, keys in cases:
+        key = f'{module}.{name}'
+        if only is not None and name not in only and key not in only:
+            continue
+        results[key] = dict()
+        for dim in sizes:
+            curried_random.seed(seed)
+            speed = calibration()
+            result = measure(func, tuple(arguments[dim][k] for k in keys), budget, repeat)
+            result['relative'] = round(result['ns'] / min(speed, calibration()), 6)
+            results[key][str(dim)] = result
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'sizes': list(sizes),
+        'budget': budget,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def median(
+    reports: List
+) -> dict:
+    """ report of the median measurement, by relative time, of each primitive and size over the reports of runs """
+    report = dict(reports[0], results=dict())
+    for key, sizes in reports[0]['results'].items():
+        report['results'][key] = dict()
+        for dim in sizes:
+            results = sorted((r['results'][key][dim] for r in reports), key=lambda result: result['relative'])
+            report['results'][key][dim] = results[len(results) // 2]
+    return report
+
+
+def environment_mismatch(
+    report: dict,
+    baseline: dict
+) -> List:
+    """ the fields of the environment, the Python version and the platform, that differ from the baseline """
+    return [
+        f'{field} {baseline.get(field)} != {report[field]}' for field in ('python', 'platform')
+        if baseline.get(field) != report[field]
+    ]
+
+
+def compare(
+    report: dict,
+    baseline: dict,
+    threshold: float = 1.5,
+    slack_ns: float = 500
+) -> List:
+    """
+    primitives and sizes that are slower or allocate more than threshold times the baseline,
+    comparing timings relative to the calibration workload timed around each measurement
+    """
+    regressions = []
+    for key, sizes in report['results'].items():
+        for dim, current in sizes.items():
+            previous = baseline['results'].get(key, dict()).get(dim)
+            if previous is None:
+                continue
+            if current['relative'] > threshold * previous['relative'] and current['ns'] > previous['ns'] + slack_ns:
+                regressions.append((key, dim, 'ns', previous['ns'], current['ns']))
+            if current['bytes'] > threshold * previous['bytes'] and current['bytes'] > previous['bytes'] + 1024:
+                regressions.append((key, dim, 'bytes', previous['bytes'], current['bytes']))
+    return regressions
+
+
+def confirm(
+    report: dict,
+    baseline: dict,
+    threshold: float = 1.5,
+    retries: Integer = 2
+) -> List:
+    """
+    regressions that persist when re-measuring them: a slowdown is dropped once a re-measurement is not
+    a regression itself, and the report keeps the original measurement unless a re-measurement is faster
+    by both the time per call and the relative time
+    """
+    regressions = compare(report, baseline, threshold)
+    for attempt in range(retries):
+        slower = {(key, dim) for key, dim, metric, previous, current in regressions if metric == 'ns'}
+        if len(slower) == 0:
+            break
+        for key, dim in slower:
+            again = run((int(dim),), report['seed'], report['budget'], report['repeat'], only=[key])
+            result = again['results'][key][dim]
+            current = report['results'][key][dim]
+            if result['relative'] < current['relative'] and result['ns'] < current['ns']:
+                report['results'][key][dim] = result
+            if not any(metric == 'ns' for _, _, metric, _, _ in compare(again, baseline, threshold)):
+                regressions = [r for r in regressions if r[:3] != (key, dim, 'ns')]
+    return regressions
+
+
+def main(
+    arg_list: List = None
+) -> Integer:
+    """ command-line interface, returning a non-zero exit status on regressions """
+    parser = argparse.ArgumentParser(description='microbenchmarks for the re-arc DSL primitives')
+    parser.add_argument('--output', help='where to write the JSON report')
+    parser.add_argument('--baseline', help=f'JSON report to compare against, {BASELINE} with --check')
+    parser.add_argument('--check', action='store_true', help='compare against the baseline, which must exist')
+    parser.add_argument('--threshold', type=float, default=1.5, help='tolerated slowdown and allocation ratio')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='grid sizes to benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--budget', type=float, default=0.002, help='seconds per timing run')
+    parser.add_argument('--only', nargs='+', help='primitives to benchmark, e.g. objects or utils.add')
+    parser.add_argument('--runs', type=int, default=1, help='runs whose median measurements are reported')
+    parser.add_argument(
+        '--ignore-environment', action='store_true',
+        help='compare against a baseline recorded with another Python version or on another platform'
+    )
+    args = parser.parse_args(arg_list)
+    if args.check and args.baseline is None:
+        args.baseline = BASELINE
+    if args.baseline is not None and not os.path.exists(args.baseline):
+        parser.error(f'baseline report {args.baseline} not found, write it with --output {args.baseline}')
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+        current = {'python': platform.python_version(), 'platform': platform.platform()}
+        mismatch = environment_mismatch(current, baseline)
+        if mismatch and not args.ignore_environment:
+            parser.error(
+                f'baseline report {args.baseline} was recorded in another environment ({", ".join(mismatch)}), '
+                f'write a baseline here with --output or pass --ignore-environment'
+            )
+        for field in mismatch:
+            print(f'warning: comparing against a baseline from another environment: {field}')
+    report = median([run(tuple(args.sizes), args.seed, args.budget, only=args.only) for _ in range(args.runs)])
+    regressions = [] if baseline is None else confirm(report, baseline, args.threshold)
+    if args.output is not None:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=1)
+    print(f'{"primitive":>24} ' + ' '.join(f'{f"{dim}x{dim}":>18}' for dim in args.sizes))
+    for key, sizes in report['results'].items():
+        print(f'{key:>24} ' + ' '.join(f'{r["ns"]:>9.0f}ns {r["bytes"]:>6}B' for r in sizes.values()))
+    for key, dim, metric, previous, current in regressions:
+        print(f'regression: {key} at {dim}x{dim}: {metric} {previous} -> {current}')
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
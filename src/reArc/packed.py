@@ -0,0 +1,209 @@
+"""
+    Contains a compact binary format for generated re-arc tasks, with a memory-mapped reader.
+
+    A packed task file starts with the magic bytes, followed by the examples, each given by its
+    input and its output grid. A grid is stored as a byte for its height, a byte for its width
+    and its cells, row by row, packed two per byte with the first cell in the high nibble. The
+    file ends with an index of the offsets of the examples, the number of examples and the magic
+    bytes again, such that any example can be read from the index without decoding the others.
+    Cell values have to lie within 0 and 15.
+"""
+
+import mmap
+import os
+import struct
+
+
+MAGIC = b'REARCPK1'
+OFFSET = struct.Struct('<Q')
+FOOTER = struct.Struct('<Q8s')
+
+HIGH = bytes(b >> 4 for b in range(256))
+LOW = bytes(b & 15 for b in range(256))
+
+
+def pack_grid(
+    grid: tuple
+) -> bytes:
+    """ packs a grid into its shape header followed by its cells """
+    h = len(grid)
+    w = len(grid[0]) if h else 0
+    cells = bytes(v for row in grid for v in row)
+    if h > 255 or w > 255 or len(cells) != h * w:
+        raise ValueError(f'can not pack a grid of shape {h}x{len(cells) // max(h, 1)}')
+    if cells and max(cells) > 15:
+        raise ValueError(f'can not pack cell value {max(cells)}')
+    if len(cells) % 2:
+        cells += b'\x00'
+    return bytes((h, w)) + bytes(a << 4 | b for a, b in zip(cells[::2], cells[1::2]))
+
+
+def unpack_grid(
+    buffer: bytes,
+    offset: int
+) -> tuple:
+    """ unpacks the grid at an offset of a buffer, returns it with the offset after it """
+    h, w = buffer[offset], buffer[offset + 1]
+    start = offset + 2
+    end = start + (h * w + 1) // 2
+    data = buffer[start:end]
+    cells = bytearray(2 * len(data))
+    cells[0::2] = data.translate(HIGH)
+    cells[1::2] = data.translate(LOW)
+    return tuple(tuple(cells[i * w:(i + 1) * w]) for i in range(h)), end
+
+
+def grid_size(
+    header: bytes
+) -> int:
+    """ number of bytes of a packed grid, given its shape header """
+    return 2 + (header[0] * header[1] + 1) // 2
+
+
+class PackedWriter:
+    """ writes the examples of a task as a packed task file """
+
+    extension = '.rearc'
+
+    def __init__(
+        self,
+        path: str,
+        offset: int = 0,
+        count: int = 0
+    ):
+        self.path = path
+        self.offsets = []
+        if offset:
+            self.fp = open(path, 'r+b')
+            self.fp.truncate(offset)
+            position = len(MAGIC)
+            for _ in range(count):
+                self.offsets.append(position)
+                for _ in range(2):
+                    self.fp.seek(position)
+                    position += grid_size(self.fp.read(2))
+            if position != offset:
+                raise ValueError(f'{path} does not hold {count} examples before offset {offset}')
+            self.fp.seek(offset)
+        else:
+            self.fp = open(path, 'wb')
+            self.fp.write(MAGIC)
+
+    @property
+    def count(self) -> int:
+        return len(self.offsets)
+
+    def write(
+        self,
+        example: dict
+    ) -> None:
+        """ appends an example to the task file """
+        data = pack_grid(example['input']) + pack_grid(example['output'])
+        self.offsets.append(self.fp.tell())
+        self.fp.write(data)
+
+    def tell(self) -> int:
+        """ flushes the task file to disk and returns the offset to reopen it at """
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        return self.fp.tell()
+
+    def release(self) -> None:
+        """ closes the task file without completing it, to reopen it at an offset reported by tell """
+        self.fp.close()
+
+    def close(self) -> None:
+        """ writes the index and closes the task file """
+        self.fp.write(b''.join(OFFSET.pack(offset) for offset in self.offsets))
+        self.fp.write(FOOTER.pack(len(self.offsets), MAGIC))
+        self.fp.close()
+
+
+class PackedTask:
+    """ random access to the examples of a packed task file, mapped into memory """
+
+    def __init__(
+        self,
+        path: str
+    ):
+        self.path = path
+        with open(path, 'rb') as fp:
+            self.buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(self.buffer)
+        if size < len(MAGIC) + FOOTER.size or self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a packed task file')
+        self.n, magic = FOOTER.unpack_from(self.buffer, size - FOOTER.size)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a complete packed task file')
+        self.index = size - FOOTER.size - self.n * OFFSET.size
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(
+        self,
+        k: int
+    ) -> dict:
+        """ decodes the k-th example of the task """
+        if k < 0:
+            k += self.n
+        if not 0 <= k < self.n:
+            raise IndexError(f'example {k} out of range for {self.n} examples')
+        offset, = OFFSET.unpack_from(self.buffer, self.index + k * OFFSET.size)
+        i, offset = unpack_grid(self.buffer, offset)
+        o, offset = unpack_grid(self.buffer, offset)
+        return {'input': i, 'output': o}
+
+    def __iter__(self):
+        offset = len(MAGIC)
+        for _ in range(self.n):
+            i, offset = unpack_grid(self.buffer, offset)
+            o, offset = unpack_grid(self.buffer, offset)
+            yield {'input': i, 'output': o}
+
+    def close(self) -> None:
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PackedDataset:
+    """ random access to example k of task t of a packed dataset as dataset[t][k] """
+
+    def __init__(
+        self,
+        path: str
+    ):
+        self.tasks_path = os.path.join(path, 'tasks')
+        self.keys = sorted(
+            fn[:-len(PackedWriter.extension)] for fn in os.listdir(self.tasks_path)
+            if fn.endswith(PackedWriter.extension)
+        )
+        self.tasks = dict()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __getitem__(
+        self,
+        key: str
+    ) -> PackedTask:
+        """ the task of a key, mapped into memory on first access """
+        if key not in self.tasks:
+            self.tasks[key] = PackedTask(os.path.join(self.tasks_path, f'{key}{PackedWriter.extension}'))
+        return self.tasks[key]
+
+    def close(self) -> None:
+        for task in self.tasks.values():
+            task.close()
+        self.tasks.clear()
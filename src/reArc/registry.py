@@ -0,0 +1,178 @@
+"""
+    Contains a lazy registry of the generators and verifiers of the re-arc tasks.
+
+    Importing generators.py and verifiers.py compiles or unmarshals and then executes all 400
+    generators and verifiers, while a worker or notebook cell often needs a single task. The
+    registry instead indexes the top-level functions of a source file by their byte offsets and
+    compiles a function only when it is first looked up. The compiled code of each function is
+    cached on disk, keyed by the hash of its source, such that later processes only unmarshal
+    it. The index itself is cached until the source file changes.
+
+    The functions loaded from one source file share a namespace that holds the imports of the
+    file, like the functions of the imported module share its globals, so the optimization
+    layers install their primitives for lazily loaded functions the same way.
+"""
+
+import hashlib
+import json
+import marshal
+import os
+import re
+import sys
+import types
+from collections.abc import Mapping
+from typing import Callable
+
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_DIR = os.path.join(SOURCE_DIR, '__pycache__', 'registry')
+
+DEF = re.compile(rb'^def (\w+)\(', re.M)
+
+
+class LazyMapping(Mapping):
+    """ mapping from task keys to functions that are loaded on first access """
+
+    def __init__(
+        self,
+        keys: list,
+        load: Callable
+    ):
+        self.keys_ = dict.fromkeys(keys)
+        self.load = load
+        self.loaded = dict()
+
+    def __getitem__(self, key):
+        if key not in self.loaded:
+            if key not in self.keys_:
+                raise KeyError(key)
+            self.loaded[key] = self.load(key)
+        return self.loaded[key]
+
+    def __iter__(self):
+        return iter(self.keys_)
+
+    def __len__(self):
+        return len(self.keys_)
+
+    def __contains__(self, key):
+        return key in self.keys_
+
+    def wrap(
+        self,
+        wrapper: Callable
+    ) -> 'LazyMapping':
+        """ lazy mapping to the wrapped functions """
+        return LazyMapping(self.keys_, lambda key: wrapper(self[key]))
+
+
+def save(
+    path: str,
+    data: bytes
+) -> None:
+    """ atomically writes a cache file, skipping it if the cache folder is not writable """
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as fp:
+            fp.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+class Source:
+    """ index of the top-level functions of a source file, compiled one at a time into a shared namespace """
+
+    def __init__(
+        self,
+        module_name: str
+    ):
+        self.module_name = module_name
+        self.path = os.path.join(SOURCE_DIR, f'{module_name}.py')
+        self.index = self.load_index()
+        self.module = None
+
+    def load_index(self) -> dict:
+        """ byte offset, length and first line of the header and of each function of the source file """
+        stat = os.stat(self.path)
+        version = [stat.st_mtime_ns, stat.st_size]
+        index_path = os.path.join(CACHE_DIR, f'{self.module_name}.index.json')
+        try:
+            with open(index_path, 'r') as fp:
+                index = json.load(fp)
+            if index['version'] == version:
+                return index
+        except (OSError, ValueError, KeyError):
+            pass
+        with open(self.path, 'rb') as fp:
+            source = fp.read()
+        starts = [(m.start(), m.group(1).decode()) for m in DEF.finditer(source)]
+        ends = [start for start, _ in starts[1:]] + [len(source)]
+        functions = dict()
+        lineno, previous = 1, 0
+        for (start, name), end in zip(starts, ends):
+            lineno += source.count(b'\n', previous, start)
+            functions[name] = [start, end - start, lineno]
+            previous = start
+        header = [0, starts[0][0] if starts else len(source), 1]
+        index = {'version': version, 'header': header, 'functions': functions}
+        save(index_path, json.dumps(index).encode())
+        return index
+
+    def code(
+        self,
+        name: str,
+        offset: int,
+        length: int,
+        lineno: int
+    ) -> types.CodeType:
+        """ compiled code of a part of the source file, cached by its first line and hash """
+        with open(self.path, 'rb') as fp:
+            fp.seek(offset)
+            segment = fp.read(length)
+        digest = hashlib.sha1(segment).hexdigest()[:16]
+        cache_path = os.path.join(CACHE_DIR, f'{name}.{lineno}.{digest}.{sys.implementation.cache_tag}.bin')
+        try:
+            with open(cache_path, 'rb') as fp:
+                return marshal.load(fp)
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        code = compile('\n' * (lineno - 1) + segment.decode(), self.path, 'exec')
+        save(cache_path, marshal.dumps(code))
+        return code
+
+    def namespace(self) -> dict:
+        """ globals of the functions of the source file, holding the imports of the file """
+        if self.module is None:
+            module = types.ModuleType(self.module_name)
+            module.__file__ = self.path
+            exec(self.code(f'{self.module_name}.header', *self.index['header']), module.__dict__)
+            self.module = module
+        return self.module.__dict__
+
+    def function(
+        self,
+        name: str
+    ) -> types.FunctionType:
+        """ loads a function of the source file """
+        namespace = self.namespace()
+        if name not in namespace:
+            exec(self.code(name, *self.index['functions'][name]), namespace)
+        return namespace[name]
+
+
+SOURCES = dict()
+
+
+def functions(
+    module_name: str,
+    prefix: str
+) -> LazyMapping:
+    """ lazy mapping from task keys to the functions of a source file named with a prefix and the key """
+    if module_name not in SOURCES:
+        SOURCES[module_name] = Source(module_name)
+    source = SOURCES[module_name]
+    keys = [name[len(prefix):] for name in source.index['functions'] if name.startswith(prefix)]
+    return LazyMapping(sorted(keys), lambda key: source.function(prefix + key))
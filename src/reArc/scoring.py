@@ -0,0 +1,172 @@
+"""
+    Contains the difficulty scoring of generated re-arc datasets, run as a stage after generation.
+
+    Examples are scored by metrics, functions mapping an example to a float, which are looked up
+    by name in METRICS unless given explicitly. The RNG difficulty depends on the random draws
+    made while generating an example, so it is recorded during generation and only copied from
+    the metadata. The PSO difficulties are also copied to the metadata, where they were stored before
+    scoring became a separate stage.
+
+    Scores are written to the scores folder of the dataset in a columnar layout: a file of
+    little-endian doubles per metric, holding the scores of the tasks one after the other in
+    key order, and an index with the position and number of scores of each task, such that the
+    scores of one metric and task are read without loading any other scores.
+"""
+
+import itertools
+import json
+import os
+import pickle
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import dsl
+from dsl import *
+
+from utils import format_example
+
+import writers
+
+
+def get_pso_difficulty(
+    example: dict
+) -> float:
+    """
+    PSO-Difficulty: proxy measure for example difficulty, defined as weighted sum of #Pixels, #Symbols, #Objects
+    """
+    i, o = example['input'], example['output']
+    hwi = height(i) * width(i)
+    hwo = height(o) * width(o)
+    pix_pct = (hwi + hwo) / 1800
+    col_pct = len(palette(i) | palette(o)) / 10
+    obj_dens = (len(objects(i, T, F, F)) / hwi + len(objects(o, T, F, F)) / hwo) / 2
+    return (pix_pct + col_pct + obj_dens) / 3
+
+
+METRICS = {
+    'pso': get_pso_difficulty,
+}
+
+# metrics whose scores are also stored in the metadata, as the <name>_difficulties of each task
+METADATA_METRICS = ('pso',)
+
+
+def score_task(
+    task_path: str,
+    metrics: dict
+) -> tuple:
+    """ number of examples of a task file and their scores by metric """
+    examples = [format_example(example) for example in writers.load_task(task_path)]
+    return len(examples), {name: [metric(example) for example in examples] for name, metric in metrics.items()}
+
+
+def write_column(
+    fp: Any,
+    values: list
+) -> None:
+    """ appends scores to a column file as little-endian doubles """
+    column = array('d', values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    column.tofile(fp)
+
+
+def score_dataset(
+    path: str,
+    metrics: dict = None,
+    n_workers: int = 1
+) -> None:
+    """
+    scores the examples of a dataset folder by all metrics, in n_workers processes, to which the
+    metrics are pickled: with n_workers > 1 they must be module-level functions, not lambdas or closures
+    """
+    metrics = METRICS if metrics is None else metrics
+    if n_workers > 1:
+        try:
+            pickle.dumps(metrics)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise ValueError(f'metrics must be picklable to be scored in {n_workers} processes: {e}') from e
+    tasks_path = os.path.join(path, 'tasks')
+    task_files = {fn.split('.')[0]: fn for fn in os.listdir(tasks_path)}
+    keys = sorted(task_files)
+    task_paths = [os.path.join(tasks_path, task_files[key]) for key in keys]
+    metadata_path = os.path.join(path, 'metadata.json')
+    metadata = None
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r') as fp:
+            metadata = json.load(fp)
+    scores_path = os.path.join(path, 'scores')
+    os.makedirs(scores_path, exist_ok=True)
+    names = list(metrics) + ([] if metadata is None else ['rng'])
+    columns = {name: open(os.path.join(scores_path, f'{name}.f64'), 'wb') for name in names}
+    index = {'metrics': names, 'tasks': dict()}
+    position = 0
+    executor = ProcessPoolExecutor(n_workers) if n_workers > 1 else None
+    if executor is None:
+        results = map(score_task, task_paths, itertools.repeat(metrics))
+    else:
+        results = executor.map(score_task, task_paths, itertools.repeat(metrics))
+    for key, (n, scores) in zip(keys, results):
+        if metadata is not None:
+            scores['rng'] = metadata[key]['rng_difficulties']
+            for name in METADATA_METRICS:
+                if name in metrics:
+                    metadata[key][f'{name}_difficulties'] = scores[name]
+        for name in names:
+            write_column(columns[name], scores[name])
+        index['tasks'][key] = [position, n]
+        position += n
+    if executor is not None:
+        executor.shutdown()
+    for column in columns.values():
+        column.close()
+    with open(os.path.join(scores_path, 'index.json'), 'w') as fp:
+        json.dump(index, fp)
+    if metadata is not None:
+        writers.save_checkpoint(metadata_path, metadata)
+
+
+def load_scores(
+    path: str,
+    metric: str,
+    keys: list = None
+) -> dict:
+    """ scores of a metric by task key, for all or the given tasks, reading only their scores """
+    scores_path = os.path.join(path, 'scores')
+    with open(os.path.join(scores_path, 'index.json'), 'r') as fp:
+        index = json.load(fp)
+    keys = list(index['tasks']) if keys is None else keys
+    scores = dict()
+    with open(os.path.join(scores_path, f'{metric}.f64'), 'rb') as fp:
+        for key in keys:
+            start, n = index['tasks'][key]
+            fp.seek(start * 8)
+            column = array('d')
+            column.fromfile(fp, n)
+            if sys.byteorder == 'big':
+                column.byteswap()
+            scores[key] = column.tolist()
+    return scores
+
+
+def load_task_scores(
+    path: str,
+    key: str,
+    metric: str = 'pso'
+) -> list:
+    """
+    scores of a metric for one task of a dataset folder: read from the scores folder if the dataset was
+    scored, else from the <metric>_difficulties of the task in the metadata, else computed from the task file
+    """
+    if os.path.exists(os.path.join(path, 'scores', f'{metric}.f64')):
+        return load_scores(path, metric, [key])[key]
+    metadata_path = os.path.join(path, 'metadata.json')
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r') as fp:
+            stats = json.load(fp).get(key, dict())
+        if f'{metric}_difficulties' in stats:
+            return stats[f'{metric}_difficulties']
+    tasks_path = os.path.join(path, 'tasks')
+    fn = next(fn for fn in os.listdir(tasks_path) if fn.split('.')[0] == key)
+    return score_task(os.path.join(tasks_path, fn), {metric: METRICS[metric]})[1][metric]
@@ -0,0 +1,236 @@
+"""
+    Contains an example server streaming freshly generated re-arc examples, for training jobs
+    that want an unbounded stream of examples rather than a fixed dataset folder.
+
+    A pool of warm worker processes, set up with the generators and verifiers like the workers of
+    generate_dataset, generates the examples of a task in chunks. The server keeps at most
+    `prefetch` examples of each task buffered or being generated and only asks for new chunks of a
+    task when it is drawn, so generation never runs ahead of the consumer, and at most `max_chunks`
+    chunks are being generated at once over all tasks. Batches draw their tasks at random and wait
+    for the examples of a drawn task, such that the stream only depends on the seed and not on the
+    number of workers or their timing. A task is exhausted by a chunk without examples: it is then
+    served until the examples of its other chunks are used up. Examples are not deduplicated.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import curried_random
+from utils import is_grid, recording
+
+import main
+
+
+def generate_worker_chunk(
+    key: str,
+    seed: int,
+    n: int,
+    diff_lb: float,
+    diff_ub: float,
+    verify: bool,
+    max_attempts: int
+) -> tuple:
+    """
+    generates up to n valid and non-degenerate examples of a task in a worker process within max_attempts
+    attempts, returns them as (input, output, difficulty) triples with the number of attempts and seconds
+    """
+    generator, verifier = main.worker_mappers[0][key], main.worker_mappers[1][key]
+    rng = curried_random.Random(seed)
+    examples, n_attempts, start = [], 0, time.time()
+    while len(examples) < n and n_attempts < max_attempts:
+        n_attempts += 1
+        try:
+            with curried_random.using(rng), recording() as difficulties:
+                example = generator(diff_lb, diff_ub)
+            assert is_grid(example['input'])
+            assert is_grid(example['output'])
+        except Exception:
+            continue
+        if verify and not main.verify_example(verifier, example)[0]:
+            continue
+        if example['input'] == example['output']:
+            continue
+        examples.append((example['input'], example['output'], main.get_rng_difficulty(difficulties)))
+    return examples, n_attempts, time.time() - start
+
+
+class ExampleServer:
+    """ iterator (and async iterator) over batches of (task, input, output, difficulty) tuples """
+
+    def __init__(
+        self,
+        keys: list = None,
+        seed: int = 42,
+        diff_lb: float = 0,
+        diff_ub: float = 1,
+        batch_size: int = 32,
+        n_workers: int = None,
+        prefetch: int = 64,
+        chunk_size: int = 8,
+        verify: bool = True,
+        max_attempts: int = 1000,
+        max_chunks: int = None,
+        use_grid_builder: bool = False,
+        use_memo: bool = False
+    ):
+        """
+        keys: tasks to serve examples of, all tasks if None
+        seed: seed of the stream, the examples of a chunk are seeded from it, the task and the chunk
+        batch_size: number of examples per batch
+        n_workers: number of worker processes, the number of CPUs if None
+        prefetch: maximal number of examples of a task that are buffered or being generated
+        chunk_size: number of examples of a task generated at once by a worker
+        verify: whether to keep only examples that pass the verifier of their task
+        max_attempts: number of attempts per chunk, a task whose chunk yields no example is exhausted
+        max_chunks: maximal number of chunks being generated at once, twice the number of workers if None
+        """
+        self.keys = sorted(main.get_generators().keys()) if keys is None else sorted(keys)
+        self.seed = seed
+        self.diff_lb = diff_lb
+        self.diff_ub = diff_ub
+        self.batch_size = batch_size
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+        self.prefetch = max(prefetch, chunk_size)
+        self.chunk_size = chunk_size
+        self.verify = verify
+        self.max_attempts = max_attempts
+        self.max_chunks = 2 * self.n_workers if max_chunks is None else max_chunks
+        self.layers = {'use_grid_builder': use_grid_builder, 'use_memo': use_memo}
+        self.rng = random.Random(seed)
+        self.active = list(self.keys)
+        self.buffers = {key: deque() for key in self.keys}
+        self.in_flight = {key: 0 for key in self.keys}
+        self.n_chunks = {key: 0 for key in self.keys}
+        self.n_released = {key: 0 for key in self.keys}
+        self.finished = {key: dict() for key in self.keys}
+        self.stats = {
+            key: {'n_served': 0, 'n_generated': 0, 'n_attempts': 0, 'seconds': 0, 'exhausted': False}
+            for key in self.keys
+        }
+        self.futures = dict()
+        self.executor = None
+        self.start_time = None
+        self.lock = threading.Lock()
+
+    def start(self) -> None:
+        """ starts the worker processes, the prefetch queues of the tasks are filled once they are drawn """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                self.n_workers, initializer=main.init_worker, initargs=(self.layers,)
+            )
+            self.start_time = time.time()
+
+    def close(self) -> None:
+        """ stops the worker processes, dropping the buffered examples """
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+            self.futures.clear()
+
+    def refill(
+        self,
+        key: str
+    ) -> None:
+        """
+        submits chunks of a task until its prefetch queue is full or max_chunks chunks are being generated,
+        none once it is exhausted
+        """
+        if self.stats[key]['exhausted']:
+            return
+        while (
+            self.in_flight[key] + len(self.buffers[key]) + self.chunk_size <= self.prefetch
+            and len(self.futures) < self.max_chunks
+        ):
+            seed = main.task_seed(self.seed, f'{key}/{self.n_chunks[key]}')
+            future = self.executor.submit(
+                generate_worker_chunk, key, seed, self.chunk_size, self.diff_lb, self.diff_ub,
+                self.verify, self.max_attempts
+            )
+            self.futures[future] = key, self.n_chunks[key]
+            self.in_flight[key] += self.chunk_size
+            self.n_chunks[key] += 1
+
+    def collect(self) -> None:
+        """
+        waits for at least one chunk and moves the examples of the finished chunks to their buffers, in
+        the order the chunks of a task were submitted
+        """
+        done, _ = wait(self.futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            key, chunk = self.futures.pop(future)
+            examples, n_attempts, seconds = future.result()
+            stats = self.stats[key]
+            stats['n_generated'] += len(examples)
+            stats['n_attempts'] += n_attempts
+            stats['seconds'] += seconds
+            self.finished[key][chunk] = examples
+            while self.n_released[key] in self.finished[key]:
+                examples = self.finished[key].pop(self.n_released[key])
+                self.n_released[key] += 1
+                self.in_flight[key] -= self.chunk_size
+                self.buffers[key].extend(examples)
+                if not examples:
+                    stats['exhausted'] = True
+
+    def next_batch(self) -> list:
+        """
+        the next batch of examples, of tasks drawn at random, fewer only if all tasks are exhausted; an exhausted
+        task drawn without buffered or pending examples is no longer drawn
+        """
+        with self.lock:
+            self.start()
+            batch = []
+            while len(batch) < self.batch_size and self.active:
+                key = self.rng.choice(self.active)
+                while not self.buffers[key] and (self.in_flight[key] or not self.stats[key]['exhausted']):
+                    self.refill(key)
+                    self.collect()
+                if not self.buffers[key]:
+                    self.active.remove(key)
+                    continue
+                i, o, difficulty = self.buffers[key].popleft()
+                batch.append((key, i, o, difficulty))
+                self.stats[key]['n_served'] += 1
+                self.refill(key)
+            return batch
+
+    def metrics(self) -> dict:
+        """ per task statistics, with the throughput of its workers and of the server in examples per second """
+        elapsed = time.time() - self.start_time if self.start_time is not None else 0
+        metrics = dict()
+        for key, stats in self.stats.items():
+            metrics[key] = dict(stats)
+            metrics[key]['n_buffered'] = len(self.buffers[key])
+            metrics[key]['worker_throughput'] = stats['n_generated'] / stats['seconds'] if stats['seconds'] else 0
+            metrics[key]['throughput'] = stats['n_served'] / elapsed if elapsed else 0
+        return metrics
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> list:
+        batch = self.next_batch()
+        if not batch:
+            raise StopIteration
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> list:
+        batch = await asyncio.get_running_loop().run_in_executor(None, self.next_batch)
+        if not batch:
+            raise StopAsyncIteration
+        return batch
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
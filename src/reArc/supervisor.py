@@ -0,0 +1,105 @@
+"""
+    Contains a supervisor running calls in a worker process with a deadline per call.
+
+    A call that does not return before its deadline raises `DeadlineExceeded`, and its worker is
+    killed and replaced by a fresh one before the next call, so a pathologically slow call only
+    costs its deadline. Exceptions raised by a call are raised by `call` as well. Functions and
+    arguments are sent to the worker like those of a `ProcessPoolExecutor`, and workers are set
+    up with an initializer like the processes of the executor.
+"""
+
+import multiprocessing
+import multiprocessing.connection
+import pickle
+from typing import Callable
+
+
+class DeadlineExceeded(Exception):
+    """ raised when a supervised call does not return before its deadline """
+
+
+def serve(
+    conn: multiprocessing.connection.Connection,
+    initializer: Callable,
+    initargs: tuple
+) -> None:
+    """ runs the calls received on a connection in a worker process, sending back their results """
+    if initializer is not None:
+        initializer(*initargs)
+    conn.send(None)
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            result = (True, func(*args))
+        except Exception as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            conn.send((False, RuntimeError(f'the result of {func.__name__} can not be sent: {e}')))
+
+
+class Supervisor:
+    """ worker process running one call at a time, replaced when a call exceeds its deadline """
+
+    def __init__(
+        self,
+        initializer: Callable = None,
+        initargs: tuple = ()
+    ):
+        self.initializer = initializer
+        self.initargs = initargs
+        self.process = None
+        self.conn = None
+        self.n_recycled = 0
+
+    def start(self) -> None:
+        """ starts a worker process and waits for its initializer to finish """
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=serve, args=(child_conn, self.initializer, self.initargs), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn.recv()
+
+    def stop(self) -> None:
+        """ kills the worker process, if any """
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+            self.process = self.conn = None
+
+    def call(
+        self,
+        timeout: float,
+        func: Callable,
+        *args
+    ):
+        """ runs func(*args) in the worker process, raising DeadlineExceeded after timeout seconds """
+        if self.process is None:
+            self.start()
+        self.conn.send((func, args))
+        if not self.conn.poll(timeout):
+            self.stop()
+            self.n_recycled += 1
+            raise DeadlineExceeded(f'{func.__name__} did not return within {timeout} seconds')
+        try:
+            success, value = self.conn.recv()
+        except EOFError:
+            self.stop()
+            self.n_recycled += 1
+            raise RuntimeError(f'the worker process died while running {func.__name__}')
+        if not success:
+            raise value
+        return value
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
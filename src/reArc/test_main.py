@@ -0,0 +1,120 @@
+import gc
+import os
+
+import pytest
+
+import main
+import writers
+
+
+def make_mappers():
+    """
+    a task whose examples swap two cells, and whose verifier fails on purpose when the first one is
+    odd, which the generator only draws once the warm-up examples were generated
+    """
+    n_calls = [0]
+
+    def generator(diff_lb, diff_ub):
+        n_calls[0] += 1
+        first, second = main.unifint(diff_lb, diff_ub, (0, 9)), main.unifint(diff_lb, diff_ub, (0, 9))
+        if n_calls[0] <= 8:
+            first -= first % 2
+        return {'input': ((first, second),), 'output': ((second, first),)}
+
+    def verifier(grid):
+        first, second = grid[0]
+        return ((second, first + first % 2),)
+
+    return {'task': generator}, {'task': verifier}
+
+
+def swap_mappers():
+    """ a task whose examples swap two cells, with a consistent verifier """
+    def generator(diff_lb, diff_ub):
+        first, second = main.unifint(diff_lb, diff_ub, (0, 9)), main.unifint(diff_lb, diff_ub, (0, 9))
+        return {'input': ((first, second),), 'output': ((second, first),)}
+
+    return {'task': generator}, {'task': lambda grid: ((grid[0][1], grid[0][0]),)}
+
+
+
+@pytest.mark.parametrize('task_format', ['json', 'jsonl', 'packed'])
+def test_sampled_mismatch_drops_unverified_examples(tmp_path, task_format):
+    for folder in ('tasks', 'checkpoints'):
+        os.makedirs(tmp_path / folder)
+    counts = []
+    stats = main.generate_task(
+        'task', make_mappers(), str(tmp_path), 0, 20, 0, 1, task_format=task_format,
+        verification='sampled', verification_warmup=5, verification_fraction=0.25, progress=counts.append
+    )
+    extension = writers.WRITERS[task_format].extension
+    examples = writers.load_task(str(tmp_path / 'tasks' / f'task{extension}'))
+    assert counts != sorted(counts)
+    assert len(examples) == len(stats['rng_difficulties']) == 20
+    assert all(example['input'][0][0] % 2 == 0 for example in examples)
+    assert stats['n_unverified'] == 0
+
+
+def test_sampled_checkpoints_hold_no_examples(tmp_path):
+    for folder in ('tasks', 'checkpoints'):
+        os.makedirs(tmp_path / folder)
+    checkpoint_path = str(tmp_path / 'checkpoints' / 'task.json')
+    windows = []
+    progress = lambda count: windows.append((writers.load_checkpoint(checkpoint_path) or dict()).get('window'))
+    main.generate_task(
+        'task', swap_mappers(), str(tmp_path),
+        0, 40, 0, 1, checkpoint_interval=0, verification='sampled', verification_warmup=5,
+        verification_fraction=0.25, progress=progress
+    )
+    windows = [window for window in windows if window is not None]
+    assert windows and all(isinstance(i, int) for window in windows for i in window['unverified'])
+
+
+def test_resume_rejects_other_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'get_mappers', lambda **layers: make_mappers())
+    path = str(tmp_path / 'dataset')
+    main.generate_dataset(path, n_examples=4, score=False)
+    main.generate_dataset(path, n_examples=4, score=False, resume=True)
+    for setting in ({'max_attempts': 100}, {'verification': 'sampled'}, {'example_timeout': 5.0}):
+        with pytest.raises(ValueError):
+            main.generate_dataset(path, n_examples=4, score=False, resume=True, **setting)
+
+
+def test_workers_generate_the_same_tasks(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'get_mappers', lambda **layers: swap_mappers())
+    for n_workers in (1, 2):
+        main.generate_dataset(str(tmp_path / f'{n_workers}'), n_examples=20, n_workers=n_workers, score=False)
+    assert (tmp_path / '1' / 'tasks' / 'task.json').read_bytes() == (tmp_path / '2' / 'tasks' / 'task.json').read_bytes()
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.mark.parametrize('task_format', ['json', 'jsonl', 'packed'])
+def test_resumed_task_matches_uninterrupted_run(tmp_path, task_format):
+    extension = writers.WRITERS[task_format].extension
+    for run in ('uninterrupted', 'resumed'):
+        for folder in ('tasks', 'checkpoints'):
+            os.makedirs(tmp_path / run / folder)
+    uninterrupted = main.generate_task('task', swap_mappers(), str(tmp_path / 'uninterrupted'), 0, 30, 0, 1, task_format=task_format)
+
+    def interrupt(count):
+        if count == 13:
+            raise Interrupted
+    path = str(tmp_path / 'resumed')
+    try:
+        main.generate_task('task', swap_mappers(), path, 0, 30, 0, 1, task_format=task_format, checkpoint_interval=0, progress=interrupt)
+    except Interrupted:
+        pass
+    gc.collect()
+    checkpoint = writers.load_checkpoint(os.path.join(path, 'checkpoints', 'task.json'))
+    task_path = os.path.join(path, 'tasks', f'task{extension}')
+    assert checkpoint['count'] == 12
+    assert os.path.getsize(task_path) > checkpoint['offset']
+    stats = main.generate_task('task', swap_mappers(), path, 0, 30, 0, 1, task_format=task_format)
+    counts = lambda stats: (stats['n_attempts'], {reason: rejection['count'] for reason, rejection in stats['rejections'].items()})
+    assert stats['rng_difficulties'] == uninterrupted['rng_difficulties']
+    assert counts(stats) == counts(uninterrupted)
+    expected = (tmp_path / 'uninterrupted' / 'tasks' / f'task{extension}').read_bytes()
+    assert open(task_path, 'rb').read() == expected
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import microbenchmarks
+
+
+def test_baseline_covers_all_cases():
+    with open(microbenchmarks.BASELINE) as fp:
+        baseline = json.load(fp)
+    keys = {f'dsl.{name}' for name in microbenchmarks.CASES} | {f'utils.{name}' for name in microbenchmarks.UTILS_CASES}
+    assert set(baseline['results']) == keys
+    assert all(list(sizes) == [str(dim) for dim in microbenchmarks.SIZES] for sizes in baseline['results'].values())
+
+
+def test_check_fails_without_baseline(tmp_path):
+    with pytest.raises(SystemExit) as e:
+        microbenchmarks.main(['--check', '--baseline', str(tmp_path / 'missing.json'), '--only', 'identity'])
+    assert e.value.code == 2
+
+
+def test_median_of_runs():
+    reports = [{'seed': 0, 'results': {'dsl.size': {'3': {'ns': ns, 'bytes': 0, 'relative': ns / 10}}}} for ns in (5, 1, 3)]
+    assert microbenchmarks.median(reports)['results']['dsl.size']['3']['ns'] == 3
+
+
+def test_check_refuses_baseline_of_other_environment(tmp_path):
+    path = tmp_path / 'baseline.json'
+    path.write_text(json.dumps({'python': '0.0.0', 'platform': 'elsewhere', 'results': {}}))
+    arguments = ['--check', '--baseline', str(path), '--only', 'identity', '--sizes', '3']
+    with pytest.raises(SystemExit) as e:
+        microbenchmarks.main(arguments)
+    assert e.value.code == 2
+    assert microbenchmarks.main(arguments + ['--ignore-environment']) == 0
+
+
+@pytest.mark.parametrize('ns, relative, persists, kept', [(800, 5, True, 1000), (100, 5, False, 1000), (800, 1, False, 800)])
+def test_confirm_keeps_measurement_faster_by_both_metrics(monkeypatch, ns, relative, persists, kept):
+    def report(ns, relative):
+        return {'seed': 0, 'budget': 0, 'repeat': 1, 'results': {'dsl.size': {'3': {'ns': ns, 'bytes': 0, 'relative': relative}}}}
+
+    monkeypatch.setattr(microbenchmarks, 'run', lambda *args, **kwargs: report(ns, relative))
+    current = report(1000, 2)
+    regressions = microbenchmarks.confirm(current, report(10, 1))
+    assert bool(regressions) == persists
+    assert current['results']['dsl.size']['3']['ns'] == kept
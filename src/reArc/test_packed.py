@@ -0,0 +1,44 @@
+import pytest
+
+import packed
+
+
+def example(k: int) -> dict:
+    """ an example with odd and even numbers of cells and values up to 15 """
+    h, w = 1 + k % 3, 1 + k % 4
+    grid = tuple(tuple((k + i * w + j) % 16 for j in range(w)) for i in range(h))
+    return {'input': grid, 'output': tuple(zip(*grid))}
+
+
+def test_reopened_writer_appends_examples(tmp_path):
+    path = str(tmp_path / f'task{packed.PackedWriter.extension}')
+    writer = packed.PackedWriter(path)
+    for k in range(3):
+        writer.write(example(k))
+    offset, count = writer.tell(), writer.count
+    writer.write(example(99))
+    writer.tell()
+    writer.release()
+    writer = packed.PackedWriter(path, offset, count)
+    for k in range(3, 7):
+        writer.write(example(k))
+    writer.close()
+    expected = [example(k) for k in range(7)]
+    with packed.PackedTask(path) as task:
+        assert len(task) == len(expected)
+        assert [task[k] for k in range(len(task))] == expected
+        assert list(task) == expected
+        assert task[-1] == expected[-1]
+        with pytest.raises(IndexError):
+            task[len(expected)]
+
+
+def test_reopening_at_a_wrong_count_is_refused(tmp_path):
+    path = str(tmp_path / f'task{packed.PackedWriter.extension}')
+    writer = packed.PackedWriter(path)
+    for k in range(3):
+        writer.write(example(k))
+    offset = writer.tell()
+    writer.release()
+    with pytest.raises(ValueError):
+        packed.PackedWriter(path, offset, 2)
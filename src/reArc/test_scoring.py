@@ -0,0 +1,44 @@
+import json
+import os
+
+import pytest
+
+import scoring
+
+EXAMPLES = [
+    {'input': [[0, 1], [1, 0]], 'output': [[1, 0], [0, 1]]},
+    {'input': [[2, 2, 2]], 'output': [[3], [3], [3]]},
+]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    os.makedirs(tmp_path / 'tasks')
+    with open(tmp_path / 'tasks' / 'task.json', 'w') as fp:
+        json.dump(EXAMPLES, fp)
+    with open(tmp_path / 'metadata.json', 'w') as fp:
+        json.dump({'task': {'rng_difficulties': [0.25, 0.75]}}, fp)
+    return str(tmp_path)
+
+
+def test_scoring_adds_pso_difficulties_to_metadata(dataset):
+    scoring.score_dataset(dataset)
+    with open(os.path.join(dataset, 'metadata.json')) as fp:
+        metadata = json.load(fp)
+    assert metadata['task']['pso_difficulties'] == scoring.load_scores(dataset, 'pso')['task']
+    assert scoring.load_scores(dataset, 'rng')['task'] == [0.25, 0.75]
+
+
+def test_task_scores_of_unscored_datasets(dataset):
+    expected = [scoring.get_pso_difficulty(scoring.format_example(example)) for example in EXAMPLES]
+    assert scoring.load_task_scores(dataset, 'task') == expected
+    assert scoring.load_task_scores(dataset, 'task', 'rng') == [0.25, 0.75]
+    os.remove(os.path.join(dataset, 'metadata.json'))
+    assert scoring.load_task_scores(dataset, 'task') == expected
+
+
+def test_unpicklable_metrics_are_rejected_with_workers(dataset):
+    with pytest.raises(ValueError):
+        scoring.score_dataset(dataset, {'size': lambda example: len(example['input'])}, n_workers=2)
+    scoring.score_dataset(dataset, {'size': lambda example: len(example['input'])})
+    assert scoring.load_scores(dataset, 'size')['task'] == [2, 1]
@@ -0,0 +1,52 @@
+import multiprocessing
+
+import pytest
+
+import main
+import server
+
+pytestmark = pytest.mark.skipif(
+    multiprocessing.get_start_method() != 'fork', reason='the workers inherit the patched mappers by forking'
+)
+
+N_EXAMPLES = 20
+
+
+def make_mappers(keys):
+    """ tasks whose examples count the generator calls of a worker, the limited task fails after N_EXAMPLES """
+    n_calls = [0]
+
+    def generator(diff_lb, diff_ub):
+        n_calls[0] += 1
+        value = main.unifint(diff_lb, diff_ub, (0, 8))
+        return {'input': ((value, n_calls[0] % 10),), 'output': ((value + 1, n_calls[0] % 10),)}
+
+    def limited(diff_lb, diff_ub):
+        if n_calls[0] >= N_EXAMPLES:
+            raise ValueError('limit reached')
+        return generator(diff_lb, diff_ub)
+
+    generators = {key: generator for key in keys}
+    generators['limited'] = limited
+    return lambda **layers: (generators, {key: None for key in generators})
+
+
+def test_exhausted_task_serves_its_buffered_examples(monkeypatch):
+    monkeypatch.setattr(main, 'get_mappers', make_mappers([]))
+    monkeypatch.setattr(main, 'get_generators', lambda: {'limited': None})
+    with server.ExampleServer(batch_size=3, n_workers=1, prefetch=32, verify=False, max_attempts=8) as stream:
+        batches = list(stream)
+    assert sum(len(batch) for batch in batches) == N_EXAMPLES
+    assert stream.stats['limited']['exhausted']
+
+
+def test_chunks_are_submitted_for_drawn_tasks_only(monkeypatch):
+    keys = [f'task{i}' for i in range(50)]
+    monkeypatch.setattr(main, 'get_mappers', make_mappers(keys))
+    with server.ExampleServer(keys, batch_size=4, n_workers=2, max_chunks=3, verify=False) as stream:
+        batch = next(stream)
+        assert len(stream.futures) <= 3
+        assert all(
+            stream.in_flight[key] + len(stream.buffers[key]) <= stream.prefetch for key in keys
+        )
+        assert {key for key in keys if stream.n_chunks[key]} <= {key for key, i, o, difficulty in batch}
@@ -0,0 +1,53 @@
+import os
+import time
+
+import pytest
+
+import supervisor
+
+STATE = dict()
+
+
+def initialize(value):
+    STATE['value'] = value
+
+
+def state(key):
+    return STATE[key], os.getpid()
+
+
+def crash():
+    os._exit(1)
+
+
+def hang(seconds):
+    time.sleep(seconds)
+
+
+def test_crashed_worker_is_replaced():
+    with supervisor.Supervisor(initialize, ('ready',)) as worker:
+        value, pid = worker.call(5, state, 'value')
+        with pytest.raises(RuntimeError):
+            worker.call(5, crash)
+        assert worker.n_recycled == 1
+        assert worker.call(5, state, 'value') == ('ready', worker.process.pid)
+        assert worker.process.pid != pid
+
+
+def test_hanging_call_exceeds_its_deadline():
+    with supervisor.Supervisor(initialize, ('ready',)) as worker:
+        value, pid = worker.call(5, state, 'value')
+        start = time.time()
+        with pytest.raises(supervisor.DeadlineExceeded):
+            worker.call(0.2, hang, 60)
+        assert time.time() - start < 5
+        assert worker.n_recycled == 1
+        assert worker.call(5, state, 'value') == ('ready', worker.process.pid)
+        assert worker.process.pid != pid
+
+
+def test_exceptions_are_raised_without_replacing_the_worker():
+    with supervisor.Supervisor() as worker:
+        with pytest.raises(KeyError):
+            worker.call(5, state, 'value')
+        assert worker.n_recycled == 0
@@ -0,0 +1,27 @@
+import threading
+import time
+
+import utils
+
+
+def double(x):
+    return 2 * x
+
+
+def compute(x):
+    time.sleep(0.01)
+    return double(x)
+
+
+def test_layered_calls_of_threads_do_not_leak_primitives():
+    triple = lambda x: 3 * x
+    layered_compute = utils.layered(compute, lambda namespace: {'double': triple})
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(layered_compute(i))) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [3 * i for i in range(8)]
+    assert globals()['double'] is not triple
+    assert compute(1) == 2
@@ -2,14 +2,7 @@
 A file containing implementations for the transformed python functions.
 """
 
-def curry(func):
-    def curried(*args):
-        # print(f'{args}')
-        if len(args) == func.__code__.co_argcount:
-            return func(*args)
-        else:
-            return lambda x: curried(*(args + (x,)))
-    return curried
+from currying import curry
 
 @curry
 def __bitOr__(a, b):
@@ -39,4 +32,44 @@ def __rshift__(a, b):
 @curry
 def __bitNot__(a):
     """Implements bitwise NOT operation"""
-    return ~a
\ No newline at end of file
+    return ~a
+
+class Iteration:
+    """Next values of the variables of a loop, as returned by an iteration of the loop continuing it"""
+    __slots__ = ('loop', 'values')
+
+    def __init__(self, loop, values):
+        self.loop = loop
+        self.values = values
+
+
+@curry
+def loop_fold(n, body):
+    """
+    Runs a loop lowered by the Flatliner without recursing once per iteration. The body maps
+    the function continuing the loop to an iteration, both taking the n loop variables at once
+    or one at a time. An iteration returns what continuing the loop returns, to run the next
+    iteration, or the result of the loop.
+    """
+    def collect(func, args=()):
+        def collecting(*more):
+            if len(args + more) >= n:
+                return func(args + more)
+            return collect(func, args + more)
+        return collecting
+
+    def apply(func, values):
+        if func.__code__.co_argcount == len(values):
+            return func(*values)
+        for value in values:
+            func = func(value)
+        return func
+
+    def run(values):
+        again = collect(lambda values: Iteration(again, values))
+        iteration = body(again)
+        result = apply(iteration, values)
+        while isinstance(result, Iteration) and result.loop is again:
+            result = apply(iteration, result.values)
+        return result
+    return collect(run)
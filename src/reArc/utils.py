@@ -2,30 +2,28 @@
     Contains the standard re-arc utils with some additions:
         - functions with two or more arguments have been curried,
         - operator functions like `sub` and `add` have been added,
-        - a plotting function is included for visualizations.
+        - a plotting function is included for visualizations,
+        - difficulties sampled by `unifint` are recorded per context with `recording`.
+        - the optional grid builder and memoization layers install their primitives with `layered`.
 """
 
+import functools
+import inspect
 import os
-import matplotlib.pyplot as plt
-from matplotlib.colors import ListedColormap, Normalize
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from currying import curry
 
 # Custom curried random functions
-from curried_random import choice, randint, sample, shuffle, uniform
+from curried_random import uniform
 
 from dsl import *
 
 
-global rng
-rng = []
-
-def curry(func):
-    def curried(*args):
-        if len(args) == func.__code__.co_argcount:
-            return func(*args)
-        else:
-            return lambda x: curried(*(args + (x,)))
-    return curried
-
+# difficulties sampled by unifint, recorded only within a `recording` context
+difficulties = ContextVar('difficulties', default=None)
 
 @curry
 def sub(
@@ -140,8 +138,9 @@ def unifint(
     """
     a, b = bounds
     d = uniform(diff_lb, diff_ub)
-    global rng
-    rng.append(d)
+    recorded = difficulties.get()
+    if recorded is not None:
+        recorded.append(d)
     return min(max(a, round(a + (b - a) * d)), b)
 
 @curry
@@ -225,7 +224,11 @@ def plot_task(
     """
     if len(task) != 2:
         raise ValueError("Task must contain exactly 2 dictionaries")
-        
+
+    # imported on first use, as matplotlib dominates the import time of the utils
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import ListedColormap, Normalize
+
     cmap = ListedColormap([
         '#000', '#0074D9', '#FF4136', '#2ECC40', '#FFDC00',
         '#AAAAAA', '#F012BE', '#FF851B', '#7FDBFF', '#870C25'
@@ -258,6 +261,80 @@ def plot_task(
     plt.savefig(os.path.join(".", "reArc", "test_figures", "testingLambdas.png"))
 
 
+@contextmanager
+def recording():
+    """
+    records the difficulties sampled by unifint within the context (e.g. while generating one example),
+    yielding the list they are appended to
+    """
+    recorded = []
+    token = difficulties.set(recorded)
+    try:
+        yield recorded
+    finally:
+        difficulties.reset(token)
+
+
+# one reentrant lock per namespace that layers install primitives into
+INSTALL_LOCKS = {}
+
+
+def install_lock(
+    namespace: dict
+) -> threading.RLock:
+    """
+    the lock serializing the installations into a namespace
+    """
+    return INSTALL_LOCKS.setdefault(id(namespace), threading.RLock())
+
+
+@contextmanager
+def installed(
+    namespace: dict,
+    primitives: dict
+):
+    """
+    temporarily replaces primitives within a module namespace (e.g. the globals of generators.py),
+    restoring the previous bindings on exit
+
+    the namespace is shared by the whole process: installations hold the lock of the namespace, such
+    that those of concurrent threads run one after the other instead of interleaving (which would leave
+    primitives installed after both returned), and nested installations of one thread stack; callers of
+    the module that do not install anything take no lock and see the installed primitives while another
+    thread holds it, so a process should not mix layered and unlayered callers of a module across threads
+    """
+    with install_lock(namespace):
+        previous = {name: namespace[name] for name in primitives if name in namespace}
+        namespace.update(primitives)
+        try:
+            yield namespace
+        finally:
+            for name in primitives:
+                if name in previous:
+                    namespace[name] = previous[name]
+                else:
+                    namespace.pop(name, None)
+
+
+def layered(
+    func: Callable,
+    primitives: Callable
+) -> Callable:
+    """
+    runs a generator or verifier with the primitives returned for the namespace of its module when the call
+    starts installed, such that layers stack; the lock of the namespace is held while the primitives are
+    looked up, see `installed`
+    """
+    namespace = inspect.unwrap(func).__globals__
+    lock = install_lock(namespace)
+
+    @functools.wraps(func)
+    def layered_func(*args):
+        with lock, installed(namespace, primitives(namespace)):
+            return func(*args)
+    return layered_func
+
+
 @curry
 def fix_bugs(
     dataset: dict
@@ -0,0 +1,167 @@
+"""
+    Contains the streaming task writers and the checkpoint files of the dataset generation.
+
+    Examples are written to the task file as soon as they are accepted, so a task never has to
+    be held in memory as a whole. The JSON writer produces the same bytes as `json.dump` of the
+    list of examples, the JSONL writer one JSON object per line and the packed writer the binary
+    format of `packed`. All of them can be reopened at a byte offset they reported through `tell`,
+    discarding anything written after it, which is how an interrupted run continues from its last
+    checkpoint.
+
+    Checkpoints are small JSON files that are replaced atomically, such that a killed run leaves
+    either the previous or the next checkpoint behind, never a partial one.
+"""
+
+import json
+import os
+
+import packed
+
+
+class JSONWriter:
+    """ writes the examples of a task as a JSON list """
+
+    extension = '.json'
+
+    def __init__(
+        self,
+        path: str,
+        offset: int = 0,
+        count: int = 0
+    ):
+        self.path = path
+        self.count = count
+        if offset:
+            self.fp = open(path, 'r+b')
+            self.fp.truncate(offset)
+            self.fp.seek(offset)
+        else:
+            self.fp = open(path, 'wb')
+            self.start()
+
+    def start(self) -> None:
+        self.fp.write(b'[')
+
+    def write(
+        self,
+        example: dict
+    ) -> None:
+        """ appends an example to the task file """
+        prefix = b', ' if self.count else b''
+        self.fp.write(prefix + json.dumps(example).encode())
+        self.count += 1
+
+    def end(self) -> None:
+        self.fp.write(b']')
+
+    def tell(self) -> int:
+        """ flushes the task file to disk and returns the offset to reopen it at """
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        return self.fp.tell()
+
+    def release(self) -> None:
+        """ closes the task file without completing it, to reopen it at an offset reported by tell """
+        self.fp.close()
+
+    def close(self) -> None:
+        """ completes and closes the task file """
+        self.end()
+        self.fp.close()
+
+
+class JSONLWriter(JSONWriter):
+    """ writes the examples of a task as JSON lines """
+
+    extension = '.jsonl'
+
+    def start(self) -> None:
+        pass
+
+    def write(
+        self,
+        example: dict
+    ) -> None:
+        """ appends an example to the task file """
+        self.fp.write(json.dumps(example).encode() + b'\n')
+        self.count += 1
+
+    def end(self) -> None:
+        pass
+
+
+WRITERS = {
+    'json': JSONWriter,
+    'jsonl': JSONLWriter,
+    'packed': packed.PackedWriter,
+}
+
+
+def load_task(
+    path: str
+) -> list:
+    """ loads the examples of a task file written by any of the writers """
+    if path.endswith(packed.PackedWriter.extension):
+        with packed.PackedTask(path) as task:
+            return list(task)
+    with open(path, 'r') as fp:
+        if path.endswith(JSONLWriter.extension):
+            return [json.loads(line) for line in fp]
+        return json.load(fp)
+
+
+def load_examples(
+    path: str,
+    start: int = 0
+) -> list:
+    """ loads the examples of a task file from the start-th one on, decoding only those of a packed task file """
+    if path.endswith(packed.PackedWriter.extension):
+        with packed.PackedTask(path) as task:
+            return [task[k] for k in range(start, len(task))]
+    return load_task(path)[start:]
+
+
+def load_checkpoint(
+    path: str
+) -> dict:
+    """ loads a checkpoint, None if there is none """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as fp:
+        return json.load(fp)
+
+
+def save_checkpoint(
+    path: str,
+    checkpoint: dict
+) -> None:
+    """ atomically replaces a checkpoint """
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as fp:
+        json.dump(checkpoint, fp)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp_path, path)
+
+
+def convert_dataset(
+    path: str,
+    out_path: str,
+    task_format: str = 'packed'
+) -> None:
+    """ writes the tasks of a dataset folder to a new dataset folder in another task format """
+    writer_class = WRITERS[task_format]
+    tasks_path = os.path.join(out_path, 'tasks')
+    os.makedirs(tasks_path)
+    for fn in sorted(os.listdir(os.path.join(path, 'tasks'))):
+        key = fn.split('.')[0]
+        writer = writer_class(os.path.join(tasks_path, f'{key}{writer_class.extension}'))
+        for example in load_task(os.path.join(path, 'tasks', fn)):
+            writer.write(example)
+        writer.close()
+    metadata_path = os.path.join(path, 'metadata.json')
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r') as fp:
+            metadata = json.load(fp)
+        with open(os.path.join(out_path, 'metadata.json'), 'w') as fp:
+            json.dump(metadata, fp)
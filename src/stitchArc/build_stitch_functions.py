@@ -12,7 +12,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))) # a
 from tqdm import tqdm
 
 # Flatliner and transformation imports
-from src.flatliner.flatliner import Flatliner
+from src.flatliner.flatliner import AstFlatliner
 from src.flatliner.transformations import transform_lambda
 
 # LOTlib3 imports
@@ -36,7 +36,7 @@ def process_and_save_file(input_file, output_dir, filename):
     """
     
     # Process the file using flatliner and the transformations
-    test = Flatliner()
+    test = AstFlatliner()
     test.set_ast(input_file)
     lambda_f = test.unparse()
     lambda_transformed_f = transform_lambda(lambda_f)